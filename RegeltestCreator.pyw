@@ -1,39 +1,111 @@
 import logging
 import os
 import shutil
+import subprocess
 import sys
-import time
+from typing import Optional
+
+# has to be set up before the other imports to measure them
+from src.startup_profiler import StartupProfiler
+
+profiler = StartupProfiler('--profile-startup' in sys.argv)
+if profiler.enabled:
+    sys.argv.remove('--profile-startup')
+
+
+def self_check() -> int:
+    # smoke test of a freshly installed binary, run by the update finisher. It must not touch the database: if the
+    # check fails, the previous version is restored and has to find its database unchanged.
+    import src.datatypes
+    import src.ui_mainwindow
+    from src.basic_config import base_path, app_version
+
+    if not os.path.isfile(os.path.join(base_path, 'alembic.ini')):
+        return 1
+    print(app_version)
+    return 0
+
+
+if '--self-check' in sys.argv:
+    sys.exit(self_check())
 
 import psutil
-from PySide6.QtCore import Signal, QThread
+from PySide6.QtCore import QThread, QTimer
 from PySide6.QtGui import Qt
 from PySide6.QtWidgets import QApplication, QDialog, QVBoxLayout, QLabel
 
 from src.basic_config import log_level
-from src.database import db
-from src.main_application import MainWindow
 
 logging.basicConfig()
 logging.getLogger('sqlalchemy.engine').setLevel(log_level)
 logging.getLogger().setLevel(log_level)
+# timing summary of every download (requests, fetch, parse and backoff times)
+logging.getLogger('src.dataset_downloader').setLevel(logging.INFO)
 
 
 class UpdateWorker(QThread):
-    finished = Signal()
+    """
+    Replaces the binary at original_path with the running one (the downloaded update) once the old process exited.
+
+    The old binary is kept as backup until the new one passed its self check and is restored otherwise. error is
+    set if the update failed.
+    """
+    exit_timeout = 60  # s to wait for the old process
+    self_check_timeout = 60  # s
 
     def __init__(self, original_path: str, old_pid: int):
         self.original_path = original_path
         self.old_pid = old_pid
+        self.error = None  # type: Optional[str]
 
         super().__init__()
 
     def run(self):
-        time.sleep(0.5)
-        while psutil.pid_exists(self.old_pid):
-            time.sleep(0.2)
-        os.remove(self.original_path)
-        shutil.copy(sys.executable, self.original_path)
-        self.finished.emit()
+        try:
+            psutil.Process(self.old_pid).wait(timeout=self.exit_timeout)
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.TimeoutExpired:
+            self.error = "Die alte Version wurde nicht beendet."
+            return
+
+        backup_path = self.original_path + ".old"
+        try:
+            os.replace(self.original_path, backup_path)
+        except OSError as err:
+            self.error = f"Die alte Version konnte nicht ersetzt werden.\n{err}"
+            return
+        try:
+            self._install()
+            if not self._self_check():
+                raise RuntimeError("Die neue Version startet nicht.")
+        except (OSError, RuntimeError, subprocess.SubprocessError) as err:
+            try:
+                if os.path.exists(self.original_path):
+                    os.remove(self.original_path)
+                os.replace(backup_path, self.original_path)
+            except OSError as restore_err:
+                self.error = f"Das Update ist fehlgeschlagen und die alte Version konnte nicht wiederhergestellt " \
+                             f"werden, sie liegt unter {backup_path}.\n{err}\n{restore_err}"
+                return
+            self.error = f"Das Update wurde rückgängig gemacht.\n{err}"
+            return
+        os.remove(backup_path)
+
+    def _install(self):
+        try:
+            # rename, works for the running binary as well
+            os.replace(sys.executable, self.original_path)
+        except OSError:
+            # e.g. cache and installation on different drives -> copy next to the target, then rename
+            temporary_path = self.original_path + ".new"
+            shutil.copy2(sys.executable, temporary_path)
+            os.replace(temporary_path, self.original_path)
+
+    def _self_check(self) -> bool:
+        result = subprocess.run([self.original_path, "--self-check"], timeout=self.self_check_timeout,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return result.returncode == 0
 
 
 class UpdateFinishDialog(QDialog):
@@ -49,9 +121,16 @@ class UpdateFinishDialog(QDialog):
         layout.addWidget(self.label)
 
         self.worker = UpdateWorker(original_path, int(old_pid))
-        self.worker.finished.connect(self.close)
+        self.worker.finished.connect(self.worker_finished)
         self.worker.start()
 
+    def worker_finished(self):
+        if self.worker.error:
+            self.label.setText(self.worker.error)
+            self.label.setWordWrap(True)
+        else:
+            self.close()
+
     def closeEvent(self, event):
         # Prevent closing the dialog while the background task is running
         if self.worker.isRunning():
@@ -61,14 +140,26 @@ class UpdateFinishDialog(QDialog):
 
 
 def run():
-    app = QApplication(sys.argv)
+    with profiler.phase("QApplication"):
+        app = QApplication(sys.argv)
     if len(sys.argv) == 3:
         test = UpdateFinishDialog(sys.argv[1], sys.argv[2])
         test.exec()
-        pass
-    main_window = MainWindow()
-    main_window.initialize()
-    main_window.show()
+        if test.worker.error:
+            # this binary is the rejected update, it must not open (and migrate) the database
+            sys.exit(1)
+    with profiler.phase("import database"):
+        from src.database import db
+    with profiler.phase("import main window"):
+        from src.main_application import MainWindow
+    with profiler.phase("create main window"):
+        main_window = MainWindow()
+    with profiler.phase("initialize"):
+        main_window.initialize()
+    with profiler.phase("show"):
+        main_window.show()
+    # report once the event loop has drawn the window
+    QTimer.singleShot(0, profiler.report)
     exit_code = app.exec()
     db.close_connection()
     sys.exit(exit_code)
@@ -0,0 +1,81 @@
+"""full-text search index spells ß as ss
+
+Revision ID: 5a962be0fe9d
+Revises: 6b50a915cab6
+Create Date: 2026-10-17 01:39:07.879127
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5a962be0fe9d'
+down_revision = '6b50a915cab6'
+branch_labels = None
+depends_on = None
+
+mchoice_text = "(SELECT group_concat(text, ' ') FROM multiple_choice WHERE question_signature = {})"
+question_rowid = "(SELECT rowid FROM question WHERE signature = {})"
+
+
+def triggers(fold: str):
+    # fold is applied to every indexed text, "{}" is the unchanged text
+    def options(signature: str) -> str:
+        return fold.format(mchoice_text.format(signature))
+
+    return {
+        'question_search_insert': f"""
+            AFTER INSERT ON question BEGIN
+                INSERT INTO question_search (rowid, question, answer_text, multiple_choice)
+                VALUES (new.rowid, {fold.format('new.question')}, {fold.format('new.answer_text')},
+                        {options('new.signature')});
+            END""",
+        'question_search_update': f"""
+            AFTER UPDATE OF question, answer_text, signature ON question BEGIN
+                UPDATE question_search SET question = {fold.format('new.question')},
+                    answer_text = {fold.format('new.answer_text')},
+                    multiple_choice = {options('new.signature')}
+                WHERE rowid = new.rowid;
+            END""",
+        'question_search_delete': """
+            AFTER DELETE ON question BEGIN
+                DELETE FROM question_search WHERE rowid = old.rowid;
+            END""",
+        'multiple_choice_search_insert': f"""
+            AFTER INSERT ON multiple_choice BEGIN
+                UPDATE question_search SET multiple_choice = {options('new.question_signature')}
+                WHERE rowid = {question_rowid.format('new.question_signature')};
+            END""",
+        'multiple_choice_search_update': f"""
+            AFTER UPDATE ON multiple_choice BEGIN
+                UPDATE question_search SET multiple_choice = {options('old.question_signature')}
+                WHERE rowid = {question_rowid.format('old.question_signature')};
+                UPDATE question_search SET multiple_choice = {options('new.question_signature')}
+                WHERE rowid = {question_rowid.format('new.question_signature')};
+            END""",
+        'multiple_choice_search_delete': f"""
+            AFTER DELETE ON multiple_choice BEGIN
+                UPDATE question_search SET multiple_choice = {options('old.question_signature')}
+                WHERE rowid = {question_rowid.format('old.question_signature')};
+            END""",
+    }
+
+
+def recreate(fold: str):
+    for name, trigger in triggers(fold).items():
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(f"CREATE TRIGGER {name} {trigger}")
+    op.execute("DELETE FROM question_search")
+    op.execute(f"""
+        INSERT INTO question_search (rowid, question, answer_text, multiple_choice)
+        SELECT question.rowid, {fold.format('question.question')}, {fold.format('question.answer_text')},
+            {fold.format('mchoice.text')} FROM question
+        LEFT JOIN (SELECT question_signature, group_concat(text, ' ') AS text FROM multiple_choice
+                   GROUP BY question_signature) AS mchoice ON mchoice.question_signature = question.signature""")
+
+
+def upgrade():
+    recreate("replace(replace({}, 'ß', 'ss'), 'ẞ', 'SS')")
+
+
+def downgrade():
+    recreate("{}")
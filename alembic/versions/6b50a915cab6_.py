@@ -0,0 +1,23 @@
+"""question.removed for merge imports
+
+Revision ID: 6b50a915cab6
+Revises: dc4f2b266cb7
+Create Date: 2026-10-17 15:20:48.113562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6b50a915cab6'
+down_revision = 'dc4f2b266cb7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('question', sa.Column('removed', sa.Date(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('question', 'removed')
@@ -0,0 +1,75 @@
+"""full-text search index
+
+Revision ID: 730f0f2e6a1e
+Revises: 6ea786c6938c
+Create Date: 2026-10-17 10:12:41.318402
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '730f0f2e6a1e'
+down_revision = '6ea786c6938c'
+branch_labels = None
+depends_on = None
+
+triggers = {
+    'question_search_insert': """
+        AFTER INSERT ON question BEGIN
+            INSERT INTO question_search (rowid, question, answer_text, multiple_choice)
+            VALUES (new.rowid, new.question, new.answer_text,
+                    (SELECT group_concat(text, ' ') FROM multiple_choice WHERE question_signature = new.signature));
+        END""",
+    'question_search_update': """
+        AFTER UPDATE OF question, answer_text, signature ON question BEGIN
+            UPDATE question_search SET question = new.question, answer_text = new.answer_text,
+                multiple_choice = (SELECT group_concat(text, ' ') FROM multiple_choice
+                                   WHERE question_signature = new.signature)
+            WHERE rowid = new.rowid;
+        END""",
+    'question_search_delete': """
+        AFTER DELETE ON question BEGIN
+            DELETE FROM question_search WHERE rowid = old.rowid;
+        END""",
+    'multiple_choice_search_insert': """
+        AFTER INSERT ON multiple_choice BEGIN
+            UPDATE question_search SET multiple_choice = (SELECT group_concat(text, ' ') FROM multiple_choice
+                                                          WHERE question_signature = new.question_signature)
+            WHERE rowid = (SELECT rowid FROM question WHERE signature = new.question_signature);
+        END""",
+    'multiple_choice_search_update': """
+        AFTER UPDATE ON multiple_choice BEGIN
+            UPDATE question_search SET multiple_choice = (SELECT group_concat(text, ' ') FROM multiple_choice
+                                                          WHERE question_signature = old.question_signature)
+            WHERE rowid = (SELECT rowid FROM question WHERE signature = old.question_signature);
+            UPDATE question_search SET multiple_choice = (SELECT group_concat(text, ' ') FROM multiple_choice
+                                                          WHERE question_signature = new.question_signature)
+            WHERE rowid = (SELECT rowid FROM question WHERE signature = new.question_signature);
+        END""",
+    'multiple_choice_search_delete': """
+        AFTER DELETE ON multiple_choice BEGIN
+            UPDATE question_search SET multiple_choice = (SELECT group_concat(text, ' ') FROM multiple_choice
+                                                          WHERE question_signature = old.question_signature)
+            WHERE rowid = (SELECT rowid FROM question WHERE signature = old.question_signature);
+        END""",
+}
+
+
+def upgrade():
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS question_search USING fts5("
+               "question, answer_text, multiple_choice, "
+               "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+    for name, trigger in triggers.items():
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {trigger}")
+    op.execute("DELETE FROM question_search")
+    op.execute("""
+        INSERT INTO question_search (rowid, question, answer_text, multiple_choice)
+        SELECT question.rowid, question.question, question.answer_text, mchoice.text FROM question
+        LEFT JOIN (SELECT question_signature, group_concat(text, ' ') AS text FROM multiple_choice
+                   GROUP BY question_signature) AS mchoice ON mchoice.question_signature = question.signature""")
+
+
+def downgrade():
+    for name in triggers:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS question_search")
@@ -0,0 +1,95 @@
+"""search index keyed by question_search_key instead of the question rowid
+
+Revision ID: ca2b2e4fd5b8
+Revises: 5a962be0fe9d
+Create Date: 2026-10-17 01:54:33.887836
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'ca2b2e4fd5b8'
+down_revision = '5a962be0fe9d'
+branch_labels = None
+depends_on = None
+
+
+def fold(text: str) -> str:
+    return f"replace(replace({text}, 'ß', 'ss'), 'ẞ', 'SS')"
+
+
+def options(signature: str) -> str:
+    return fold(f"(SELECT group_concat(text, ' ') FROM multiple_choice WHERE question_signature = {signature})")
+
+
+def triggers(row: str, insert_key: str = "", update_key: str = "", delete_key: str = ""):
+    # row selects the index row of a signature, the *_key statements maintain question_search_key
+    return {
+        'question_search_insert': f"""
+            AFTER INSERT ON question BEGIN {insert_key}
+                INSERT OR REPLACE INTO question_search (rowid, question, answer_text, multiple_choice)
+                VALUES ({row.format('new.signature')}, {fold('new.question')}, {fold('new.answer_text')},
+                        {options('new.signature')});
+            END""",
+        'question_search_update': f"""
+            AFTER UPDATE OF question, answer_text, signature ON question BEGIN {update_key}
+                UPDATE question_search SET question = {fold('new.question')}, answer_text = {fold('new.answer_text')},
+                    multiple_choice = {options('new.signature')}
+                WHERE rowid = {row.format('new.signature')};
+            END""",
+        'question_search_delete': f"""
+            AFTER DELETE ON question BEGIN
+                DELETE FROM question_search WHERE rowid = {row.format('old.signature')}; {delete_key}
+            END""",
+        'multiple_choice_search_insert': f"""
+            AFTER INSERT ON multiple_choice BEGIN
+                UPDATE question_search SET multiple_choice = {options('new.question_signature')}
+                WHERE rowid = {row.format('new.question_signature')};
+            END""",
+        'multiple_choice_search_update': f"""
+            AFTER UPDATE ON multiple_choice BEGIN
+                UPDATE question_search SET multiple_choice = {options('old.question_signature')}
+                WHERE rowid = {row.format('old.question_signature')};
+                UPDATE question_search SET multiple_choice = {options('new.question_signature')}
+                WHERE rowid = {row.format('new.question_signature')};
+            END""",
+        'multiple_choice_search_delete': f"""
+            AFTER DELETE ON multiple_choice BEGIN
+                UPDATE question_search SET multiple_choice = {options('old.question_signature')}
+                WHERE rowid = {row.format('old.question_signature')};
+            END""",
+    }
+
+
+def recreate_triggers(new_triggers):
+    for name, trigger in new_triggers.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute(f"CREATE TRIGGER {name} {trigger}")
+
+
+def rebuild(row_id: str, key_join: str = ""):
+    op.execute("DELETE FROM question_search")
+    op.execute(f"""
+        INSERT INTO question_search (rowid, question, answer_text, multiple_choice)
+        SELECT {row_id}, {fold('question.question')}, {fold('question.answer_text')}, {fold('mchoice.text')}
+        FROM question {key_join}
+        LEFT JOIN (SELECT question_signature, group_concat(text, ' ') AS text FROM multiple_choice
+                   GROUP BY question_signature) AS mchoice ON mchoice.question_signature = question.signature""")
+
+
+def upgrade():
+    op.execute("CREATE TABLE question_search_key (id INTEGER PRIMARY KEY, signature VARCHAR NOT NULL UNIQUE)")
+    op.execute("INSERT INTO question_search_key (signature) SELECT signature FROM question")
+    recreate_triggers(triggers(
+        "(SELECT id FROM question_search_key WHERE signature = {})",
+        insert_key="INSERT OR IGNORE INTO question_search_key (signature) VALUES (new.signature);",
+        update_key="UPDATE question_search_key SET signature = new.signature WHERE signature = old.signature;",
+        delete_key="DELETE FROM question_search_key WHERE signature = old.signature;"))
+    rebuild("question_search_key.id",
+            "JOIN question_search_key ON question_search_key.signature = question.signature")
+
+
+def downgrade():
+    recreate_triggers(triggers("(SELECT rowid FROM question WHERE signature = {})"))
+    rebuild("question.rowid")
+    op.execute("DROP TABLE question_search_key")
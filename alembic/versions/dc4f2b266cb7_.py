@@ -0,0 +1,28 @@
+"""indexes for question group, regeltest and statistics lookups
+
+Revision ID: dc4f2b266cb7
+Revises: 730f0f2e6a1e
+Create Date: 2026-10-17 11:02:15.804137
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'dc4f2b266cb7'
+down_revision = '730f0f2e6a1e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_question_group_id_answer_index', 'question', ['group_id', 'answer_index'])
+    op.create_index('ix_regeltest_question_question_id', 'regeltest_question', ['question_id'])
+    op.create_index('ix_regeltest_question_regeltest_id', 'regeltest_question', ['regeltest_id', 'question_id'])
+    op.create_index('ix_statistics_last_tested', 'statistics', ['last_tested'])
+
+
+def downgrade():
+    op.drop_index('ix_statistics_last_tested', 'statistics')
+    op.drop_index('ix_regeltest_question_regeltest_id', 'regeltest_question')
+    op.drop_index('ix_regeltest_question_question_id', 'regeltest_question')
+    op.drop_index('ix_question_group_id_answer_index', 'question')
@@ -0,0 +1,37 @@
+"""
+Benchmarks, run from the repository root with python -m benchmarks.<name>.
+
+Importing this package points the application directories to a temporary directory, so the benchmarks never touch
+the user's database (src.database opens it on import).
+"""
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+from src import basic_config
+
+data_dir = tempfile.mkdtemp(prefix="regeltestcreator-benchmarks-")
+basic_config.app_dirs = SimpleNamespace(user_data_dir=data_dir, user_cache_dir=os.path.join(data_dir, "cache"))
+
+group_count = 17
+
+
+def write_synthetic_xml(path: str, rule_count: int):
+    # DFB XML with rule_count rules, every third one multiple choice and every 50th a duplicate signature
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="utf-8"?>\n<ROOT>\n<GRUPPEN>\n')
+        for group_id in range(1, group_count + 1):
+            file.write(f'<GRUPPE><GRUPPENNR>{group_id}</GRUPPENNR><GRUPPENTEXT> Gruppe {group_id} </GRUPPENTEXT>'
+                       f'</GRUPPE>\n')
+        file.write('</GRUPPEN>\n<REGELN>\n')
+        for i in range(rule_count):
+            signature = uuid.UUID(int=i - 1 if i % 50 == 1 else i).hex
+            multiple_choice = "a () Ja\nb () Nein\nc () Vielleicht" if i % 3 == 0 else " "
+            answer = "b) Nein" if i % 3 == 0 else "Weiterspielen, Ballbesitz für die verteidigende Mannschaft"
+            edited = "02.06.2021" if i % 7 == 0 else " "
+            file.write(f'<REGELSATZ><LNR>{i % group_count + 1:02d}{i // group_count + 1:04d}</LNR>'
+                       f'<SIGNATUR>{signature}</SIGNATUR><FRAGE>Frage {i}: Ein Spieler steht im Abseits. '
+                       f'Wie entscheidet der Schiedsrichter?</FRAGE><MCHOICE>{multiple_choice}</MCHOICE>'
+                       f'<ANTWORT>{answer}</ANTWORT><ERST>01.06.2020</ERST><AEND>{edited}</AEND></REGELSATZ>\n')
+        file.write('</REGELN></ROOT>\n')
@@ -0,0 +1,144 @@
+"""
+Downloads the question bank from a local aiohttp stub of sr-regeltest.de which throttles like the real site: above a
+number of requests in flight, question pages are answered alternately with 429 and with a page without content.
+
+Compares BfvSrRegeltest with its defaults (adaptive concurrency, backoff with jitter) against the previous behaviour,
+all questions requested at once and retried right away.
+
+python -m benchmarks.download_throttling [--pages 20] [--capacity 12]
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from PySide6.QtCore import QCoreApplication
+from aiohttp import web
+
+import benchmarks  # noqa: F401, isolates the application directories
+from src import dataset_downloader
+from src.dataset_downloader import AdaptiveLimiter, BfvSrRegeltest
+
+questions_per_page = 25
+latency = 0.02  # s per question page
+
+
+class ThrottlingStub:
+    def __init__(self, pages: int, capacity: int):
+        self.pages = pages
+        self.capacity = capacity
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+        self.app = web.Application()
+        self.app.router.add_get('/users/sign_in', self.sign_in_page)
+        self.app.router.add_post('/users/sign_in', self.sign_in)
+        self.app.router.add_get('/questions', self.question_list)
+        self.app.router.add_get('/q/{id}', self.question)
+
+    @staticmethod
+    async def sign_in_page(_request):
+        return web.Response(text='<input name="authenticity_token" value="token">', content_type='text/html')
+
+    @staticmethod
+    async def sign_in(_request):
+        return web.Response(text="Angemeldet", content_type='text/html')
+
+    async def question_list(self, request):
+        page = int(request.query['page'])
+        rows = "".join(f'<tr><td><a href="/q/{page:02d}{i:03d}">{page:02d}{i:03d}</a></td><td>Gruppe {page}</td>'
+                       f'<td>Frage</td><td>01.01.2020</td><td>02.01.2020</td></tr>' for i in range(questions_per_page))
+        return web.Response(text=f'<table><tbody>{rows}</tbody></table>'
+                                 f'<a href="/questions?page={self.pages}">Letzte »</a>', content_type='text/html')
+
+    async def question(self, _request):
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(latency)
+            if self.in_flight > self.capacity:
+                self.rejected += 1
+                if self.rejected % 2:
+                    return web.Response(status=429, text="Too Many Requests")
+                return web.Response(text="<html><body>Bitte warten</body></html>", content_type='text/html')
+            return web.Response(text='<div class="card-body"><p>1</p><p>Frage?</p></div>'
+                                     '<div class="card-body"><p>Antwort</p></div>', content_type='text/html')
+        finally:
+            self.in_flight -= 1
+
+
+class FixedLimiter(AdaptiveLimiter):
+    def success(self):
+        pass
+
+    def throttled(self, started: float):
+        pass
+
+
+@contextmanager
+def previous_behaviour(downloader: BfvSrRegeltest) -> Iterator[None]:
+    # one request per question at once, throttled requests are retried right away
+    downloader.max_concurrency = downloader.initial_concurrency = 1000
+    downloader.max_retries = 10 ** 6
+    downloader.backoff_base = 0
+    dataset_downloader.AdaptiveLimiter = FixedLimiter
+    try:
+        yield
+    finally:
+        dataset_downloader.AdaptiveLimiter = AdaptiveLimiter
+
+
+def serve(stub: ThrottlingStub) -> int:
+    """
+    Runs the stub in its own thread and event loop, like a remote server it must not compete with the downloader for
+    the event loop. Returns the port.
+    """
+    with socket.socket() as free_socket:
+        free_socket.bind(('127.0.0.1', 0))
+        port = free_socket.getsockname()[1]
+    started = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(stub.app)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', port).start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return port
+
+
+def download(port: int, previous: bool) -> Dict[str, float]:
+    downloader = BfvSrRegeltest("benchmark", "benchmark")
+    downloader.base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    if previous:
+        with previous_behaviour(downloader):
+            _, questions, _ = asyncio.run(downloader.download_loop())
+    else:
+        _, questions, _ = asyncio.run(downloader.download_loop())
+    return {'time': time.perf_counter() - start, 'questions': len(questions)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--capacity', type=int, default=12, help="requests in flight before the stub throttles")
+    args = parser.parse_args()
+
+    _app = QCoreApplication([])
+    for name, previous in (("all at once, no backoff", True), ("adaptive, backoff", False)):
+        stub = ThrottlingStub(args.pages, args.capacity)
+        result = download(serve(stub), previous)
+        print(f"{name:25} {result['time']:6.2f} s  {result['questions']} questions, {stub.requests} requests, "
+              f"{stub.rejected} throttled ({stub.rejected / stub.requests:.0%})")
+
+
+if __name__ == '__main__':
+    main()
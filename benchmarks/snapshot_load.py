@@ -0,0 +1,78 @@
+"""
+Compares loading a dataset from a snapshot (load_snapshot) with parsing and loading it from the sr-regeltest.de JSON
+(read_in_sr_regeltest_de) and the DFB XML (read_in_origformat, iterparse_origformat), each into a new database.
+
+python -m benchmarks.snapshot_load [--rules 20000]
+"""
+import argparse
+import json
+import os
+import time
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+from benchmarks import data_dir, write_synthetic_xml
+from src.database import DatabaseConnector
+from src.datatypes import iterparse_origformat
+from src.main_application import read_in_origformat, read_in_sr_regeltest_de, write_sr_regeltest_de
+
+
+def load_xml_soup(database: DatabaseConnector, path: str):
+    with open(path, 'rb') as file:
+        question_groups, questions, mchoice = read_in_origformat(BeautifulSoup(file, "lxml-xml"))
+    database.bulk_fill_database([question_groups + questions + mchoice])
+
+
+def load_xml_iterparse(database: DatabaseConnector, path: str):
+    with open(path, 'rb') as file:
+        database.bulk_fill_database(iterparse_origformat(file))
+
+
+def load_json(database: DatabaseConnector, path: str):
+    with open(path, encoding='utf-8') as file:
+        question_groups, questions = read_in_sr_regeltest_de(json.load(file))
+    database.bulk_fill_database([question_groups + questions])
+
+
+def load_snapshot(database: DatabaseConnector, path: str):
+    database.load_snapshot(path)
+
+
+def measure(name: str, load: Callable[[DatabaseConnector, str], None], path: str, database_path: str):
+    database = DatabaseConnector(database_path)
+    start = time.perf_counter()
+    load(database, path)
+    duration = time.perf_counter() - start
+    question_count = len(database.get_all_questions())
+    database.close_connection()
+    database.engine.dispose()
+    print(f"{name:40} {duration:6.2f} s  {question_count} questions")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=20000)
+    args = parser.parse_args()
+
+    xml_path = os.path.join(data_dir, "rules.xml")
+    json_path = os.path.join(data_dir, "rules.json")
+    snapshot_path = os.path.join(data_dir, "rules.rcsnap")
+    write_synthetic_xml(xml_path, args.rules)
+    source = DatabaseConnector(os.path.join(data_dir, "source.db"))
+    load_xml_iterparse(source, xml_path)
+    with open(json_path, 'w', encoding='utf-8') as file:
+        write_sr_regeltest_de(file, source.get_all_question_groups(), source.iter_all_questions())
+    source.close_connection()
+    source.export_snapshot(snapshot_path)
+
+    measure("XML, read_in_origformat", load_xml_soup, xml_path, os.path.join(data_dir, "xml_soup.db"))
+    measure("XML, iterparse_origformat", load_xml_iterparse, xml_path, os.path.join(data_dir, "xml_iterparse.db"))
+    measure("JSON, read_in_sr_regeltest_de", load_json, json_path, os.path.join(data_dir, "json.db"))
+    measure("snapshot, new database", load_snapshot, snapshot_path, os.path.join(data_dir, "snapshot.db"))
+    # the same dataset again -> merge path, every question unchanged
+    measure("snapshot, merged into the same dataset", load_snapshot, snapshot_path, os.path.join(data_dir, "source.db"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Startup time from the first import to the shown main window, with the alembic fast path of bundled builds (the
+database is at __alembic_head__, alembic is not imported) and without it (alembic upgrade runs on every start).
+
+Every start runs in a new interpreter, which times itself with StartupProfiler.
+
+python -m benchmarks.startup [--runs 5] [--rules 5000]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from benchmarks import data_dir, write_synthetic_xml
+from src.basic_config import database_name
+from src.database import DatabaseConnector
+from src.datatypes import iterparse_origformat
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# argv: data directory, repository path, "fast" or "alembic"
+startup = '''
+import sys
+from src.startup_profiler import StartupProfiler
+profiler = StartupProfiler(True)
+
+from types import SimpleNamespace
+from src import basic_config, __alembic_head__
+basic_config.app_dirs = SimpleNamespace(user_data_dir=sys.argv[1], user_cache_dir=sys.argv[1])
+# src.database behaves like in a bundled build, alembic is found in the repository
+sys._MEIPASS = sys.argv[2]
+basic_config.is_bundled = True
+if sys.argv[3] == "alembic":
+    # never matches the stored revision
+    __alembic_head__.__alembic_head__ = ""
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+with profiler.phase("QApplication"):
+    app = QApplication([])
+with profiler.phase("import database"):
+    from src.database import db
+# no update check in the main window
+basic_config.is_bundled = False
+with profiler.phase("import main window"):
+    from src.main_application import MainWindow
+with profiler.phase("create main window"):
+    main_window = MainWindow()
+with profiler.phase("initialize"):
+    main_window.initialize()
+with profiler.phase("show"):
+    main_window.show()
+QTimer.singleShot(0, profiler.report)
+QTimer.singleShot(0, app.quit)
+app.exec()
+db.close_connection()
+'''
+
+
+def start(mode: str) -> Dict[str, float]:
+    # total and per phase ms of one start
+    environment = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    result = subprocess.run([sys.executable, "-c", startup, data_dir, repository_path, mode], cwd=repository_path,
+                            env=environment, capture_output=True, text=True, check=True)
+    times = {"total": float(re.search(r"Startup took (\d+) ms", result.stderr).group(1))}
+    for duration, name in re.findall(r"^ +([\d.]+) ms  (.+)$", result.stderr.split("Slowest imports")[0], re.M):
+        times[name] = float(duration)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--rules', type=int, default=5000)
+    args = parser.parse_args()
+
+    os.chdir(repository_path)
+    xml_path = os.path.join(data_dir, "rules.xml")
+    write_synthetic_xml(xml_path, args.rules)
+    database = DatabaseConnector(os.path.join(data_dir, database_name))
+    with open(xml_path, 'rb') as file:
+        database.bulk_fill_database(iterparse_origformat(file))
+    database.close_connection()
+    database.engine.dispose()
+
+    # warm up the file system cache
+    start("alembic")
+    results = {}  # type: Dict[str, List[Dict[str, float]]]
+    for _ in range(args.runs):
+        for mode in ("fast", "alembic"):
+            results.setdefault(mode, []).append(start(mode))
+    for mode, runs in results.items():
+        phases = ", ".join(f"{name} {statistics.median(run[name] for run in runs):.0f} ms"
+                           for name in runs[0] if name != "total")
+        print(f"{mode:8} {statistics.median(run['total'] for run in runs):6.0f} ms (median of {args.runs})  {phases}")
+
+
+if __name__ == '__main__':
+    main()
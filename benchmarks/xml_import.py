@@ -0,0 +1,78 @@
+"""
+Compares the streaming DFB XML import (iterparse_origformat) with the BeautifulSoup one (read_in_origformat) on a
+synthetic file, in time and peak Python memory.
+
+python -m benchmarks.xml_import [--rules 20000]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import tracemalloc
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from benchmarks import data_dir, write_synthetic_xml
+from src.datatypes import QuestionGroup, Question, MultipleChoice, iterparse_origformat
+from src.main_application import read_in_origformat
+
+
+def soup_items(path: str) -> Iterator[QuestionGroup | Question | MultipleChoice]:
+    with open(path, 'rb') as file:
+        question_groups, questions, mchoice = read_in_origformat(BeautifulSoup(file, "lxml-xml"))
+    yield from question_groups + questions + mchoice
+
+
+def iterparse_items(path: str) -> Iterator[QuestionGroup | Question | MultipleChoice]:
+    with open(path, 'rb') as file:
+        for batch in iterparse_origformat(file):
+            yield from batch
+
+
+def rows(items: Iterable[QuestionGroup | Question | MultipleChoice]) -> List[Tuple]:
+    # comparable rows of both imports, iterparse_origformat attaches the options to their question
+    result = set()
+    for item in items:
+        if isinstance(item, QuestionGroup):
+            result.add((item.id, item.name))
+        elif isinstance(item, Question):
+            result.add((item.signature, item.group_id, item.question_id, item.question, item.answer_index,
+                        item.answer_text, item.created, item.last_edited))
+            result.update((option.question_signature, option.index, option.text) for option in item.multiple_choice)
+        else:
+            result.add((item.question_signature, item.index, item.text))
+    return sorted(result, key=repr)
+
+
+def measure(read: Callable[[str], Iterator], path: str) -> Tuple[float, float]:
+    # the items are dropped right away, like the batches of a database import
+    start = time.perf_counter()
+    for _ in read(path):
+        pass
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    for _ in read(path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=20000)
+    args = parser.parse_args()
+
+    path = os.path.join(data_dir, "rules.xml")
+    write_synthetic_xml(path, args.rules)
+    print(f"{args.rules} rules, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+    for name, read in (("BeautifulSoup", soup_items), ("iterparse", iterparse_items)):
+        duration, peak = measure(read, path)
+        print(f"{name:15} {duration:6.2f} s  {peak:7.1f} MiB peak")
+    print("identical rows:", rows(soup_items(path)) == rows(iterparse_items(path)))
+
+
+if __name__ == '__main__':
+    main()
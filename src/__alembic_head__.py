@@ -0,0 +1,2 @@
+# head revision of the bundled migrations, regenerated by the build. Update it together with every new migration!
+__alembic_head__ = "ca2b2e4fd5b8"
@@ -4,9 +4,9 @@ import os
 import pathlib
 import platform
 import sys
-from typing import Any, Tuple, Optional
+import time
+from typing import Any, Tuple, Optional, Dict
 
-import requests
 from appdirs import AppDirs
 from packaging import version
 from sqlalchemy import inspect
@@ -16,7 +16,7 @@ from .__version__ import __version__
 
 log_level = logging.WARN
 current_platform = platform.system()
-VERSION_INFO = Optional[Tuple[str, str, str, str]]
+VERSION_INFO = Optional[Tuple[str, str, str, Optional[str], Optional[str]]]
 
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     is_bundled = True
@@ -38,6 +38,9 @@ app_version = version.parse(app_version)
 api_url = "https://api.github.com/repos/jfeil/RegeltestCreator/releases"
 dev_release = "?per_page=1"
 stable_release = "/latest"
+release_cache_name = "releases.json"
+download_cache_name = "sr_regeltest_de.json"
+checksum_suffix = ".sha256"  # the release publishes the SHA-256 of every binary as <asset name>.sha256
 
 database_name = "database.db"
 
@@ -47,9 +50,65 @@ class EagerDefault:
         self.value = value
 
 
-def check_for_update() -> Tuple[VERSION_INFO, VERSION_INFO]:  # new_version, description, url, download_url
+def _load_release_cache(cache_path: str) -> Dict[str, Any]:
+    try:
+        with open(cache_path, encoding='utf-8') as file:
+            cache = json.load(file)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_release_cache(cache_path: str, cache: Dict[str, Any]):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as file:
+            json.dump(cache, file)
+    except OSError as err:
+        logging.warning(f"Could not write the release cache: {err}")
+
+
+def _get_release_json(session, url: str, cache: Dict[str, Any], timeout: float, max_age: float, force: bool) -> Any:
+    # cached answers younger than max_age are used without a request, older ones are revalidated with
+    # ETag / Last-Modified (a 304 does not count against GitHub's rate limit). Errors fall back to the cache.
+    import requests
+
+    entry = cache.get(url)
+    if entry and not force and time.time() - entry['fetched'] < max_age:
+        return entry['body']
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    try:
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry:
+            entry['fetched'] = time.time()
+            return entry['body']
+        response.raise_for_status()
+        body = response.json()
+    except (requests.RequestException, ValueError) as err:
+        logging.info(f"Update check for {url} failed: {err}")
+        return entry['body'] if entry else None
+    cache[url] = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                  'fetched': time.time(), 'body': body}
+    return body
+
+
+def check_for_update(timeout: float = 5, max_age: float = 3600, force: bool = False, base_url: str = api_url,
+                     cache_path: Optional[str] = None) -> Tuple[VERSION_INFO, VERSION_INFO]:
+    """
+    Looks up the latest stable and dev release, each as (new_version, description, url, download_url, checksum_url)
+    or None.
+
+    Blocks for up to timeout seconds per request, so call it from a worker thread (see UpdateCheckWorker). The
+    answers are cached on disk in cache_path for max_age seconds, force revalidates them right away.
+    """
+    import requests
+
     def check(cur_version, release_info):
-        if not release_info:
+        if not isinstance(release_info, dict) or 'tag_name' not in release_info:
             return None
         if version.parse(release_info['tag_name']) <= cur_version:
             return None
@@ -57,23 +116,31 @@ def check_for_update() -> Tuple[VERSION_INFO, VERSION_INFO]:  # new_version, des
                        'Windows': ['.exe'],
                        'Linux': []}
         download_urls = {}
+        asset_urls = {asset['browser_download_url'] for asset in release_info['assets']}
         for asset in release_info['assets']:
+            if asset['browser_download_url'].endswith(checksum_suffix):
+                continue
             if set(fileendings['Darwin']) <= set(pathlib.Path(asset['browser_download_url']).suffixes):
                 download_urls['Darwin'] = asset['browser_download_url']
             elif set(fileendings['Windows']) <= set(pathlib.Path(asset['browser_download_url']).suffixes):
                 download_urls['Windows'] = asset['browser_download_url']
             else:
                 download_urls['Linux'] = asset['browser_download_url']
-        download_url = download_urls[current_platform]
-        return release_info['tag_name'], release_info['body'], release_info['html_url'], download_url
-
-    latest_dev_release = None
-    latest_release = None
-    try:
-        latest_dev_release = json.loads(requests.get(api_url + dev_release).text)[0]
-        latest_release = json.loads(requests.get(api_url + stable_release).text)
-    except:
-        pass
+        download_url = download_urls.get(current_platform)
+        checksum_url = download_url + checksum_suffix if download_url else None
+        if checksum_url not in asset_urls:
+            checksum_url = None
+        return release_info['tag_name'], release_info['body'], release_info['html_url'], download_url, checksum_url
+
+    if cache_path is None:
+        cache_path = os.path.join(app_dirs.user_cache_dir, release_cache_name)
+    cache = _load_release_cache(cache_path)
+    with requests.Session() as session:
+        latest_dev_release = _get_release_json(session, base_url + dev_release, cache, timeout, max_age, force)
+        latest_release = _get_release_json(session, base_url + stable_release, cache, timeout, max_age, force)
+    _save_release_cache(cache_path, cache)
+    if isinstance(latest_dev_release, list):
+        latest_dev_release = latest_dev_release[0] if latest_dev_release else None
     return check(app_version, latest_release), check(app_version, latest_dev_release)
 
 
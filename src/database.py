@@ -1,24 +1,219 @@
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
+import random
+import re
 import sys
-from typing import List, Tuple
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import List, Tuple, Iterable, Iterator, Dict, Any, Optional, Set, TYPE_CHECKING
 
 import sqlalchemy
-from alembic import command
-from alembic.config import Config
-from alembic.runtime.migration import MigrationContext
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import Session, Query
+from sqlalchemy import create_engine, func, insert, inspect, Table, case, event, Connection, select, ColumnElement, and_, \
+    text, literal_column, update, delete, bindparam, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.types import NullType
+from sqlalchemy.orm import Session, Query, selectinload, contains_eager
 
+from src.__alembic_head__ import __alembic_head__
 from src.basic_config import database_name, Base, is_bundled, app_dirs
-from src.datatypes import QuestionGroup, Question, MultipleChoice, Regeltest
+from src.datatypes import QuestionGroup, Question, MultipleChoice, Regeltest, RegeltestQuestion, Statistics, \
+    FilterOption, MergeReport, create_search_index, drop_search_triggers, fold_search_text
+
+if TYPE_CHECKING:
+    from alembic.config import Config
 
 database_path = os.path.join(app_dirs.user_data_dir, database_name)
 
+bulk_load_tables = (QuestionGroup.__table__, Question.__table__, MultipleChoice.__table__)
+# journal_mode stays WAL during bulk loads, switching it needs exclusive access to the database
+bulk_load_pragmas = {'synchronous': 'OFF', 'cache_size': -64000}  # cache_size in KiB
+# busy_timeout: ms a connection waits for a lock before raising "database is locked"
+connection_pragmas = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000}
+
+snapshot_format_version = 2
+readable_snapshot_formats = ('1', '2')  # 1 has no question.removed
+
+FilterConfiguration = Tuple[str, FilterOption, Any]  # dict_key, FilterOption, filter_data
+
+
+def _configure_connection(dbapi_connection, _connection_record):
+    # runs for every new connection
+    # SQLite's lower() only folds ASCII, casefold handles umlauts as well
+    dbapi_connection.create_function("casefold", 1, lambda value: value.casefold() if value is not None else None,
+                                     deterministic=True)
+    for name, value in connection_pragmas.items():
+        dbapi_connection.execute(f"PRAGMA {name}={value}")
+
+
+def question_column(dict_key: str) -> ColumnElement:
+    """
+    SQL expression of a question table column (see Question.parameters).
+
+    Statistics columns expect the query to be outer joined with Question.statistics.
+    """
+    if dict_key == 'multiple_choice':
+        return Question.answer_index != -1
+    elif dict_key == 'last_tested':
+        return Statistics.last_tested
+    elif dict_key == 'positive_tests':
+        return func.coalesce(Statistics.correct_solved, 0)
+    elif dict_key == 'negative_tests':
+        return func.coalesce(Statistics.wrong_solved, 0)
+    elif dict_key == 'streak':
+        return func.coalesce(Statistics.continous_solved_count, 0)
+    elif dict_key == 'regeltest_count':
+        return select(func.count(RegeltestQuestion.id)) \
+            .where(RegeltestQuestion.question_id == Question.signature) \
+            .scalar_subquery()
+    elif dict_key in Question.parameters:
+        return getattr(Question, dict_key)
+    raise ValueError(f"Invalid column {dict_key}")
+
+
+def compile_filter(dict_key: str, filter_option: FilterOption, value: Any) -> ColumnElement[bool]:
+    column = question_column(dict_key)
+    if filter_option == FilterOption.smaller_equal:
+        clause = column <= value
+    elif filter_option == FilterOption.smaller:
+        clause = column < value
+    elif filter_option == FilterOption.larger_equal:
+        clause = column >= value
+    elif filter_option == FilterOption.larger:
+        clause = column > value
+    elif filter_option == FilterOption.equal:
+        clause = column == value
+    elif filter_option == FilterOption.contains:
+        clause = func.casefold(column).contains(value.casefold(), autoescape=True)
+    else:
+        raise ValueError('Invalid FilterOption!')
+
+    # empty cells never match a filter (NULL already fails every comparison)
+    datatype = Question.parameters[dict_key].datatype
+    if datatype == int:
+        clause = and_(clause, column != 0)
+    elif datatype == str:
+        clause = and_(clause, column != '')
+    return clause
+
+
+def _filter_questions(query: Query, filters: List[FilterConfiguration], search: str) -> Query:
+    # restricts a question query, joined with Question.statistics, to the questions matching the filters and search
+    for filter_configuration in filters:
+        query = query.where(compile_filter(*filter_configuration))
+    search_match = _search_match(search)
+    if search_match:
+        query = query.where(text("question.signature IN (SELECT question_search_key.signature FROM question_search "
+                                 "JOIN question_search_key ON question_search_key.id = question_search.rowid "
+                                 "WHERE question_search MATCH :search_match)").bindparams(search_match=search_match))
+    return query
+
+
+def _search_match(search: str) -> Optional[str]:
+    # FTS5 query for free text input: every word has to occur, either as a word or as the beginning of one
+    words = re.findall(r"\w+", fold_search_text(search))
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _column_list(columns: Iterable[str]) -> str:
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def _snapshot_columns(conn: Connection, schema: str, table: Table) -> List[str]:
+    # columns of table which exist in the attached database, snapshots of older formats lack newer columns
+    available = {row[1] for row in conn.exec_driver_sql(f'PRAGMA {schema}.table_info("{table.name}")')}
+    return [column.name for column in table.columns if column.name in available]
+
+
+@contextmanager
+def _ddl_transaction(conn: Connection) -> Iterator[None]:
+    """
+    Transaction on conn which includes DDL statements, committed on exit or rolled back on an exception.
+
+    pysqlite only begins a transaction implicitly before INSERT, UPDATE and DELETE, so e.g. a DROP INDEX in front of
+    them would be committed on its own. The driver's transaction handling is switched off and BEGIN emitted instead.
+    """
+    conn.commit()
+    dbapi_connection = conn.connection.driver_connection
+    isolation_level = dbapi_connection.isolation_level
+    dbapi_connection.isolation_level = None
+    try:
+        with conn.begin():
+            conn.exec_driver_sql("BEGIN")
+            yield
+    finally:
+        dbapi_connection.isolation_level = isolation_level
+
+
+def _snapshot_checksum(conn: Connection, schema: str) -> str:
+    # SHA-256 over the rows of all snapshot tables in primary key order
+    digest = hashlib.sha256()
+    for table in bulk_load_tables:
+        order = ", ".join(f'"{column.name}"' for column in table.primary_key.columns)
+        columns = _column_list(_snapshot_columns(conn, schema, table))
+        digest.update(table.name.encode())
+        for row in conn.exec_driver_sql(f'SELECT {columns} FROM {schema}."{table.name}" ORDER BY {order}'):
+            digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+
+def _snapshot_dataset(conn: Connection) -> List[QuestionGroup | Question | MultipleChoice]:
+    # content of the attached snapshot as (unsaved) ORM objects for merge_import, questions removed in the snapshot
+    # are left out. The selects are typed, so dates are converted like for the main database.
+    dataset = []  # type: List[QuestionGroup | Question | MultipleChoice]
+    for table, datatype in zip(bulk_load_tables, (QuestionGroup, Question, MultipleChoice)):
+        columns = _snapshot_columns(conn, 'snapshot', table)
+        snapshot_table = sqlalchemy.table(table.name, *(sqlalchemy.column(name, table.c[name].type)
+                                                         for name in columns), schema='snapshot')
+        query = select(snapshot_table)
+        if 'removed' in columns:
+            query = query.where(snapshot_table.c.removed.is_(None))
+        dataset += [datatype(**row) for row in conn.execute(query).mappings()]
+    return dataset
+
+
+def _upsert(table: Table, conflict_columns: List[str]):
+    # INSERT ... ON CONFLICT (conflict_columns) DO UPDATE of all other columns
+    stmt = sqlite_insert(table)
+    return stmt.on_conflict_do_update(index_elements=conflict_columns,
+                                      set_={column.name: stmt.excluded[column.name] for column in table.columns
+                                            if column.name not in conflict_columns})
+
+
+def _as_date(value: date | datetime) -> date:
+    # the XML import creates datetimes for date columns
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _bulk_rows(item: QuestionGroup | Question | MultipleChoice) -> Iterator[Tuple[Table, Dict[str, Any]]]:
+    # plain column values of an (unflushed) ORM object, including the multiple choice rows attached to a question
+    if isinstance(item, Question):
+        if item.signature is None:
+            item.signature = uuid.uuid4().hex
+        for mchoice in item.multiple_choice:
+            mchoice.question_signature = item.signature
+    mapper = inspect(type(item))
+    yield mapper.local_table, {prop.columns[0].key: getattr(item, prop.key) for prop in mapper.column_attrs}
+    if isinstance(item, Question):
+        for mchoice in item.multiple_choice:
+            yield from _bulk_rows(mchoice)
+
 
 class DatabaseConnector:
+    """
+    Access to the application database. session and all methods using it belong to the Qt main thread, ORM objects
+    returned by them must not be handed to other threads.
+    """
     engine = None
 
     def __init__(self, database_path):
@@ -31,19 +226,17 @@ class DatabaseConnector:
             self.initialized = False
         database_path = f"sqlite+pysqlite:///{database_path}"
         self.engine = create_engine(f"{database_path}?check_same_thread=False", future=True)
-        if is_bundled:
-            base_path = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
-        else:
-            base_path = os.path.curdir
-        self.alembic_cfg = Config(os.path.join(base_path, 'alembic.ini'))
-        self.alembic_cfg.set_main_option('sqlalchemy.url', database_path)
-        self.alembic_cfg.set_main_option('script_location', os.path.join(base_path, 'alembic'))
+        event.listen(self.engine, 'connect', _configure_connection)
+        self.database_url = database_path
 
         if not self.initialized:
             self.initialized = True
             self._init_database()
 
+        self._question_group_config = None  # type: Optional[List[Tuple[QuestionGroup, int, int]]]
+
         self.session = Session(self.engine)
+        event.listen(self.session, 'after_flush', self._after_flush)
         try:
             self._upgrade_database()
         except sqlalchemy.exc.OperationalError as err:
@@ -51,19 +244,61 @@ class DatabaseConnector:
             self.engine.dispose()
             raise err
 
+    def _alembic_config(self) -> Config:
+        # alembic is only imported if the database has to be created or migrated
+        from alembic.config import Config
+
+        if is_bundled:
+            base_path = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
+        else:
+            base_path = os.path.curdir
+        alembic_cfg = Config(os.path.join(base_path, 'alembic.ini'))
+        alembic_cfg.set_main_option('sqlalchemy.url', self.database_url)
+        alembic_cfg.set_main_option('script_location', os.path.join(base_path, 'alembic'))
+        return alembic_cfg
+
+    def _head_revision(self) -> str:
+        if is_bundled:
+            # generated at build time, the bundled migrations cannot change afterwards
+            return __alembic_head__
+        from alembic.script import ScriptDirectory
+        return ScriptDirectory.from_config(self._alembic_config()).get_current_head()
+
     def _init_database(self):
         # Create database based on basis and stamp with alembic for future migrations
+        from alembic import command
+
         Base.metadata.create_all(self.engine)
-        command.stamp(self.alembic_cfg, "head")
+        with self.engine.begin() as conn:
+            create_search_index(conn.exec_driver_sql)
+        command.stamp(self._alembic_config(), "head")
+        self.initialized = True
 
     def _upgrade_database(self):
         with self.engine.connect() as conn:
-            context = MigrationContext.configure(conn)
-            current_rev = context.get_current_revision()
-            if not current_rev:
-                # no revision available -> created before migration was introduced
-                command.stamp(self.alembic_cfg, "440180672239")
-        command.upgrade(self.alembic_cfg, "head")
+            try:
+                current_rev = conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar()
+            except sqlalchemy.exc.OperationalError:
+                # no alembic_version table
+                current_rev = None
+        if current_rev is not None and current_rev == self._head_revision():
+            return
+
+        from alembic import command
+
+        alembic_cfg = self._alembic_config()
+        if not current_rev:
+            # no revision available -> created before migration was introduced
+            command.stamp(alembic_cfg, "440180672239")
+        command.upgrade(alembic_cfg, "head")
+
+    def _after_flush(self, session: Session, _flush_context):
+        changed = session.new | session.dirty | session.deleted
+        if any(isinstance(item, (Question, QuestionGroup)) for item in changed):
+            self._invalidate_caches()
+
+    def _invalidate_caches(self):
+        self._question_group_config = None
 
     def __bool__(self):
         # check if database is empty :)
@@ -91,7 +326,11 @@ class DatabaseConnector:
     def clear_database(self):
         self.session.close()
         Base.metadata.drop_all(self.engine)
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS question_search")
+            conn.exec_driver_sql("DROP TABLE IF EXISTS question_search_key")
         self.initialized = False
+        self._invalidate_caches()
 
     def add_object(self, datatype_object: Base):
         self.session.add(datatype_object)
@@ -101,31 +340,59 @@ class DatabaseConnector:
         question_groups = self.session.query(QuestionGroup).all()
         return question_groups
 
-    def get_all_questions(self) -> List[QuestionGroup]:
-        questions = self.session.query(Question).all()
+    def get_all_questions(self) -> List[Question]:
+        questions = self.session.query(Question).where(Question.removed.is_(None)).all()
         return questions
 
+    def get_all_questions_with_multiplechoice(self) -> List[Question]:
+        # loads all multiple choice options with one additional SELECT ... IN instead of one query per question
+        questions = self.session.query(Question) \
+            .where(Question.removed.is_(None)) \
+            .options(selectinload(Question.multiple_choice)) \
+            .all()
+        return questions
+
+    def iter_all_questions(self, batch_size: int = 500) -> Iterator[Question]:
+        # streams the questions (with multiple choice options) in batches instead of materializing the whole table
+        return self.session.query(Question) \
+            .where(Question.removed.is_(None)) \
+            .options(selectinload(Question.multiple_choice)) \
+            .yield_per(batch_size)
+
     def get_question_group(self, question_group_index: int):
         question_group = self.session.query(QuestionGroup).where(QuestionGroup.id == question_group_index).first()
         return question_group
 
-    def get_question_multiplechoice(self):
-        return_dict = []
-        for question in self.session.query(Question):
-            return_dict += [
-                (question, self.session.query(MultipleChoice).where(MultipleChoice.question == question).all())]
-        return return_dict
+    def get_question_multiplechoice(self) -> List[Tuple[Question, List[MultipleChoice]]]:
+        return [(question, question.multiple_choice) for question in self.get_all_questions_with_multiplechoice()]
 
     def get_question(self, signature: str):
         question = self.session.query(Question).where(Question.signature == signature).first()
         return question
 
+    def get_questions_by_signatures(self, signatures: Iterable[str], chunk_size: int = 500) -> List[Question]:
+        """
+        Loads the questions with the given signatures with one IN query per chunk_size signatures.
+
+        Multiple choice and statistics are loaded along. The result keeps the order of signatures, unknown signatures
+        are skipped.
+        """
+        signatures = list(signatures)
+        unique_signatures = list(dict.fromkeys(signatures))
+        questions = {}  # type: Dict[str, Question]
+        for start in range(0, len(unique_signatures), chunk_size):
+            query = self.session.query(Question) \
+                .where(Question.signature.in_(unique_signatures[start:start + chunk_size])) \
+                .options(selectinload(Question.multiple_choice), selectinload(Question.statistics))
+            questions.update((question.signature, question) for question in query)
+        return [questions[signature] for signature in signatures if signature in questions]
+
     def get_questions_by_foreignkey(self, question_groups: List[QuestionGroup], mchoice=None, randomize: bool = False,
                                     as_query: bool = False) -> Query | List[Question]:
         question_groups_ids = [question_group.id for question_group in question_groups]
         questions = self.session.query(Question)
         # noinspection PyNoneFunctionAssignment
-        questions = questions.filter(Question.group_id.in_(question_groups_ids))
+        questions = questions.filter(Question.group_id.in_(question_groups_ids), Question.removed.is_(None))
         if mchoice is not None:
             if mchoice:
                 questions = questions.where(Question.answer_index != -1)
@@ -138,6 +405,84 @@ class DatabaseConnector:
         else:
             return questions.all()
 
+    def sample_questions(self, question_groups: List[QuestionGroup], k: Optional[int] = None, mchoice=None,
+                         seed: Optional[int] = None) -> List[Question]:
+        """
+        Draws k random questions from the question groups, or all of them in random order if k is None.
+
+        Only the rowids are read (from the group index) and sampled in Python, the questions are then loaded for the
+        sample alone. The same seed gives the same sample as long as the questions do not change.
+        """
+        rowid = literal_column('question.rowid')
+        rowids = self.get_questions_by_foreignkey(question_groups, mchoice=mchoice, as_query=True) \
+            .with_entities(rowid).order_by(rowid)
+        rowids = [row[0] for row in rowids]
+        sample = random.Random(seed).sample(rowids, len(rowids) if k is None else min(k, len(rowids)))
+        questions = {}  # type: Dict[int, Question]
+        for start in range(0, len(sample), 500):
+            query = self.session.query(rowid, Question).where(rowid.in_(sample[start:start + 500]))
+            questions.update((row[0], row[1]) for row in query)
+        return [questions[question_rowid] for question_rowid in sample]
+
+    def get_question_table_page(self, question_group: QuestionGroup, sort_key: str = 'question_id',
+                                descending: bool = False, after: Optional[tuple] = None, limit: int = 200,
+                                filters: List[FilterConfiguration] = (), search: str = "") \
+            -> List[Tuple[Question, int, tuple]]:
+        """
+        One page of the question table of a group: questions matching every filter and the search text with their
+        statistics and regeltest usage count, sorted by the column sort_key.
+
+        Keyset pagination, the third element of each row is its position. Passing the position of the last row as
+        after returns the next page.
+        """
+        # multiple choice is displayed as the letter of the answer
+        sort_column = Question.answer_index if sort_key == 'multiple_choice' else question_column(sort_key)
+        # row values can't be compared with NULL -> NULL is sorted first by a flag and replaced, question_id and
+        # signature make the order unique. NullType keeps the raw values, they are only passed back as after.
+        position = (sort_column.is_not(None), func.coalesce(sort_column, 0, type_=NullType()),
+                    func.coalesce(Question.question_id, 0, type_=NullType()), Question.signature)
+        order = [column.desc() if descending else column.asc() for column in position]
+        # correlated count -> one lookup in ix_regeltest_question_question_id per question of the page
+        query = self.session.query(Question, question_column('regeltest_count'), *position) \
+            .outerjoin(Question.statistics) \
+            .where(Question.group_id == question_group.id, Question.removed.is_(None)) \
+            .options(contains_eager(Question.statistics))
+        query = _filter_questions(query, filters, search)
+        if after is not None:
+            after_clause = tuple_(*position) < tuple_(*after) if descending else tuple_(*position) > tuple_(*after)
+            query = query.where(after_clause)
+        query = query.order_by(*order).limit(limit)
+        return [(question, regeltest_count, tuple(row_position))
+                for question, regeltest_count, *row_position in query]
+
+    def get_filtered_signatures(self, filters: List[FilterConfiguration], search: str = "") -> Dict[int, Set[str]]:
+        # signatures of all questions matching every filter and the search text, grouped by question group id
+        query = self.session.query(Question.group_id, Question.signature) \
+            .outerjoin(Question.statistics) \
+            .where(Question.removed.is_(None))
+        query = _filter_questions(query, filters, search)
+        result = defaultdict(set)
+        for group_id, signature in query:
+            result[group_id].add(signature)
+        return result
+
+    def search_questions(self, search: str, limit: int = 100) -> List[Question]:
+        """
+        Full-text search over question, answer and multiple choice texts, best matches first.
+
+        All words of search have to occur (as prefix), umlauts and case are ignored.
+        """
+        search_match = _search_match(search)
+        if not search_match:
+            return []
+        stmt = select(Question).from_statement(
+            text("SELECT question.* FROM question_search "
+                 "JOIN question_search_key ON question_search_key.id = question_search.rowid "
+                 "JOIN question ON question.signature = question_search_key.signature "
+                 "WHERE question_search MATCH :search_match AND question.removed IS NULL "
+                 "ORDER BY question_search.rank LIMIT :limit"))
+        return list(self.session.scalars(stmt, {'search_match': search_match, 'limit': limit}))
+
     def get_multiplechoice_by_foreignkey(self, question: Question):
         mchoice = self.session.query(MultipleChoice).where(
             MultipleChoice.question == question).all()
@@ -150,6 +495,245 @@ class DatabaseConnector:
         self.session.add_all(dataset)
         self.session.commit()
 
+    def bulk_fill_database(self, datasets: Iterable[List[QuestionGroup | Question | MultipleChoice]],
+                           chunk_size: int = 1000):
+        """
+        Fast path of fill_database for complete dataset imports.
+
+        The rows are written with Core executemany inserts in chunks of chunk_size inside one transaction, with the
+        SQLite pragmas relaxed for the duration of the load. Secondary indexes are dropped up front and rebuilt once
+        all rows are in, within the same transaction. Use fill_database for small edits.
+        """
+        if not self.initialized:
+            self._init_database()
+        rows = {table: [] for table in bulk_load_tables}  # type: Dict[Table, List[Dict[str, Any]]]
+
+        def flush(connection):
+            for table_, values_ in rows.items():
+                if values_:
+                    connection.execute(insert(table_), values_)
+                    values_.clear()
+
+        with self.engine.connect() as conn:
+            previous_pragmas = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in bulk_load_pragmas}
+            for name, value in bulk_load_pragmas.items():
+                conn.exec_driver_sql(f"PRAGMA {name}={value}")
+            conn.commit()
+            try:
+                with _ddl_transaction(conn):
+                    indexes = [index for table in bulk_load_tables for index in table.indexes]
+                    for index in indexes:
+                        index.drop(conn, checkfirst=True)
+                    drop_search_triggers(conn.exec_driver_sql)
+                    row_count = 0
+                    for dataset in datasets:
+                        for item in dataset:
+                            for table, values in _bulk_rows(item):
+                                rows[table].append(values)
+                                row_count += 1
+                            if row_count >= chunk_size:
+                                flush(conn)
+                                row_count = 0
+                    flush(conn)
+                    for index in indexes:
+                        index.create(conn)
+                    create_search_index(conn.exec_driver_sql)
+            finally:
+                for name, value in previous_pragmas.items():
+                    conn.exec_driver_sql(f"PRAGMA {name}={value}")
+                conn.commit()
+        self.session.expire_all()
+        self._invalidate_caches()
+
+    def merge_import(self, datasets: Iterable[List[QuestionGroup | Question | MultipleChoice]],
+                     unchanged: Iterable[Tuple[int, int]] = ()) -> MergeReport:
+        """
+        Imports a complete dataset into the existing database instead of replacing it.
+
+        Questions are matched by signature, or by (group_id, question_id) for sources without signatures
+        (sr-regeltest.de). New and changed questions are written with INSERT ... ON CONFLICT DO UPDATE and their
+        multiple choice options are diffed by index, unchanged rows are not touched. Questions missing from the
+        dataset are marked as removed instead of being deleted, so their statistics and the regeltests using them
+        survive. unchanged lists (group_id, question_id) of questions which were left out of datasets because they
+        are known to be unchanged (incremental downloads), they are not marked as removed.
+        """
+        if not self.initialized:
+            self._init_database()
+        self.session.close()
+        report = MergeReport()
+        question_columns = [column.name for column in Question.__table__.columns]
+        group_column, id_column, removed_column = (question_columns.index(name)
+                                                   for name in ('group_id', 'question_id', 'removed'))
+        with self.engine.begin() as conn:
+            groups = dict(conn.execute(select(QuestionGroup.id, QuestionGroup.name)).all())
+            # rows as tuples in the order of question_columns
+            stored = {row.signature: tuple(row) for row in
+                      conn.execute(select(*Question.__table__.columns))}  # type: Dict[str, Tuple[Any, ...]]
+            stored_options = defaultdict(list)  # type: Dict[str, List[str]]
+            for signature, mchoice_text in conn.execute(select(MultipleChoice.question_signature, MultipleChoice.text)
+                                                        .order_by(MultipleChoice.question_signature,
+                                                                  MultipleChoice.index)):
+                stored_options[signature].append(mchoice_text)
+            by_key = {}  # type: Dict[Tuple[int, int], str]
+            for signature, row in stored.items():
+                key = (row[group_column], row[id_column])
+                if key not in by_key or stored[by_key[key]][removed_column] is not None:
+                    by_key[key] = signature
+
+            upsert_groups = _upsert(QuestionGroup.__table__, ['id'])
+            upsert_questions = _upsert(Question.__table__, ['signature'])
+            upsert_options = _upsert(MultipleChoice.__table__, ['question_signature', 'index'])
+            delete_options = delete(MultipleChoice.__table__).where(
+                MultipleChoice.question_signature == bindparam('b_signature'),
+                MultipleChoice.index >= bindparam('b_index'))
+
+            present = set()  # type: Set[str]
+            for dataset in datasets:
+                group_rows = []
+                questions = []
+                options = defaultdict(list)  # type: Dict[str, List[MultipleChoice]]
+                for item in dataset:
+                    if isinstance(item, QuestionGroup):
+                        if groups.get(item.id) != item.name:
+                            groups[item.id] = item.name
+                            group_rows.append({'id': item.id, 'name': item.name})
+                    elif isinstance(item, Question):
+                        questions.append(item)
+                    elif isinstance(item, MultipleChoice):
+                        options[item.question_signature].append(item)
+
+                question_rows = []
+                option_rows = []
+                option_deletes = []
+                for question in questions:
+                    signature = question.signature or by_key.get((question.group_id, question.question_id)) or \
+                        uuid.uuid4().hex
+                    if signature in present:
+                        continue
+                    present.add(signature)
+                    # plain attribute values, the instrumented attribute access is the bottleneck for large imports
+                    state = question.__dict__
+                    mchoice = state.get('multiple_choice') or options.get(question.signature, [])
+                    texts = [option.text for option in sorted(mchoice, key=lambda option: option.index)]
+                    values = {column: state.get(column) for column in question_columns}
+                    values.update(signature=signature, removed=None, created=_as_date(values['created']),
+                                  last_edited=_as_date(values['last_edited']))
+                    old_values = stored.get(signature)
+                    old_texts = stored_options.get(signature, [])
+                    if old_values is None:
+                        report.inserted += 1
+                    elif old_values == tuple(values.values()) and old_texts == texts:
+                        report.unchanged += 1
+                        continue
+                    else:
+                        report.updated += 1
+                    question_rows.append(values)
+                    option_rows += [{'question_signature': signature, 'index': index, 'text': option_text}
+                                    for index, option_text in enumerate(texts)
+                                    if index >= len(old_texts) or old_texts[index] != option_text]
+                    if len(old_texts) > len(texts):
+                        option_deletes.append({'b_signature': signature, 'b_index': len(texts)})
+
+                for statement, rows in ((upsert_groups, group_rows), (upsert_questions, question_rows),
+                                        (upsert_options, option_rows), (delete_options, option_deletes)):
+                    if rows:
+                        conn.execute(statement, rows)
+
+            skipped = [by_key[key] for key in unchanged if key in by_key]
+            present.update(skipped)
+            report.unchanged += len(skipped)
+            removed = [{'b_signature': signature} for signature, row in stored.items()
+                       if row[removed_column] is None and signature not in present]
+            if removed:
+                conn.execute(update(Question.__table__)
+                             .where(Question.signature == bindparam('b_signature'))
+                             .values(removed=date.today()), removed)
+            report.removed = len(removed)
+        self._invalidate_caches()
+        return report
+
+    def export_snapshot(self, path: str):
+        """
+        Writes question groups, questions and multiple choice options to a standalone SQLite file.
+
+        The file carries its format version and a checksum over its content in the snapshot_info table, so
+        load_snapshot can copy it into a database without parsing XML or JSON. Questions marked as removed are left
+        out.
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        snapshot_engine = create_engine(f"sqlite+pysqlite:///{path}")
+        Base.metadata.create_all(snapshot_engine, tables=list(bulk_load_tables))
+        snapshot_engine.dispose()
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS snapshot", (path,))
+            try:
+                active = {Question.__table__: "WHERE removed IS NULL",
+                          MultipleChoice.__table__: "WHERE question_signature IN "
+                                                    "(SELECT signature FROM main.question WHERE removed IS NULL)"}
+                for table in bulk_load_tables:
+                    columns = _column_list(column.name for column in table.columns)
+                    conn.exec_driver_sql(f'INSERT INTO snapshot."{table.name}" ({columns}) '
+                                         f'SELECT {columns} FROM main."{table.name}" {active.get(table, "")}')
+                conn.exec_driver_sql("CREATE TABLE snapshot.snapshot_info (key VARCHAR PRIMARY KEY, value VARCHAR)")
+                conn.exec_driver_sql("INSERT INTO snapshot.snapshot_info (key, value) VALUES (?, ?), (?, ?)",
+                                     ('format_version', str(snapshot_format_version),
+                                      'checksum', _snapshot_checksum(conn, 'snapshot')))
+                conn.commit()
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql("DETACH DATABASE snapshot")
+
+    def load_snapshot(self, path: str) -> MergeReport:
+        """
+        Imports a snapshot written by export_snapshot.
+
+        The snapshot is attached and verified first. An empty database is filled by copying the tables in one
+        transaction, an existing dataset is merged with the snapshot like any other import (see merge_import), so
+        statistics and regeltests are kept. An invalid snapshot raises SnapshotError and leaves the database untouched.
+        """
+        if not os.path.isfile(path):
+            raise SnapshotError(f"{path} does not exist")
+        if not self.initialized:
+            self._init_database()
+        merge = self.has_dataset()
+        self.session.close()
+        report = MergeReport()
+        dataset = []  # type: List[QuestionGroup | Question | MultipleChoice]
+        with self.engine.connect() as conn:
+            try:
+                conn.exec_driver_sql("ATTACH DATABASE ? AS snapshot", (path,))
+            except sqlalchemy.exc.DatabaseError as err:
+                raise SnapshotError(f"Invalid snapshot: {err.orig}") from err
+            try:
+                info = dict(conn.exec_driver_sql("SELECT key, value FROM snapshot.snapshot_info").all())
+                if info.get('format_version') not in readable_snapshot_formats:
+                    raise SnapshotError(f"Unsupported snapshot format {info.get('format_version')}")
+                if info.get('checksum') != _snapshot_checksum(conn, 'snapshot'):
+                    raise SnapshotError("Snapshot checksum mismatch")
+                if merge:
+                    dataset = _snapshot_dataset(conn)
+                else:
+                    with _ddl_transaction(conn):
+                        drop_search_triggers(conn.exec_driver_sql)
+                        for table in bulk_load_tables:
+                            columns = _column_list(_snapshot_columns(conn, 'snapshot', table))
+                            conn.exec_driver_sql(f'INSERT INTO main."{table.name}" ({columns}) '
+                                                 f'SELECT {columns} FROM snapshot."{table.name}"')
+                        create_search_index(conn.exec_driver_sql)
+                        # snapshots of older versions may contain removed questions
+                        report.inserted = conn.execute(select(func.count(Question.signature))
+                                                       .where(Question.removed.is_(None))).scalar()
+            except sqlalchemy.exc.DatabaseError as err:
+                raise SnapshotError(f"Invalid snapshot: {err.orig}") from err
+            finally:
+                conn.rollback()
+                conn.exec_driver_sql("DETACH DATABASE snapshot")
+        if merge:
+            report = self.merge_import([dataset])
+        self._invalidate_caches()
+        return report
+
     def delete(self, item: QuestionGroup | Question):
         self.session.delete(item)
         self.session.commit()
@@ -167,21 +751,40 @@ class DatabaseConnector:
             return_val = 1
         return return_val
 
+    def has_dataset(self) -> bool:
+        # any question group counts, e.g. one added by hand without questions
+        if not self.initialized:
+            return False
+        return self.session.execute(select(QuestionGroup.id).limit(1)).first() is not None
+
+    def get_question_versions(self) -> Dict[Tuple[int, int], Tuple[date, date]]:
+        # (group_id, question_id) -> (created, last_edited), used to download only new and changed questions
+        query = select(Question.group_id, Question.question_id, Question.created, Question.last_edited) \
+            .where(Question.removed.is_(None))
+        return {(group_id, question_id): (created, last_edited)
+                for group_id, question_id, created, last_edited in self.session.execute(query)}
+
     def get_question_group_config(self) -> List[Tuple[QuestionGroup, int, int]]:
-        question_groups = self.get_all_question_groups()
-        return [(question_group,
-                 len(self.get_questions_by_foreignkey(question_groups=[question_group], mchoice=False)),
-                 len(self.get_questions_by_foreignkey(question_groups=[question_group], mchoice=True))) for
-                question_group in
-                question_groups]
+        # (question_group, text question count, multiple choice question count), cached until questions change
+        if self._question_group_config is None:
+            text_count = func.count(case((Question.answer_index == -1, 1)))
+            mchoice_count = func.count(case((Question.answer_index != -1, 1)))
+            query = self.session.query(QuestionGroup, text_count, mchoice_count) \
+                .outerjoin(QuestionGroup.children.and_(Question.removed.is_(None))) \
+                .group_by(QuestionGroup.id) \
+                .order_by(QuestionGroup.id)
+            self._question_group_config = [tuple(row) for row in query]
+        return self._question_group_config
 
     def get_regeltests(self) -> List[Regeltest]:
-        return self.session.query(Regeltest).all()
+        return self.session.query(Regeltest).options(selectinload(Regeltest.selected_questions)).all()
 
 
 try:
     db = DatabaseConnector(database_path)
 except sqlalchemy.exc.OperationalError as err:
     logging.error(f"{err}\n\nDatabase is corrupt. Deleting the data and recreate it.")
-    os.remove(database_path)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.isfile(database_path + suffix):
+            os.remove(database_path + suffix)
     db = DatabaseConnector(database_path)
@@ -1,17 +1,28 @@
 import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import time
 from collections import defaultdict
-from dataclasses import dataclass
-from datetime import datetime
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime, date
+from typing import List, Callable, Awaitable, TypeVar, Iterable, Optional, Dict, Any, Tuple
 
 import aiohttp
 from PySide6.QtCore import QThread, Signal, QObject
 from PySide6.QtWidgets import QDialog, QMessageBox
 from bs4 import BeautifulSoup
 
+from src.basic_config import app_dirs, download_cache_name
 from src.ui_dataset_download_dialog import Ui_DownloadDialog
 from src.ui_download_progress import Ui_DownloadProgress
 
+# the download summaries are logged at info level, RegeltestCreator.pyw lets them through
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class QuestionJSON:
@@ -49,12 +60,241 @@ class QuestionGroupJSON:
         }
 
 
+@dataclass
+class QuestionListEntry:
+    # one row of the question list
+    url: str
+    group_id: int
+    question_id: int
+    group_name: str
+    created: str
+    last_edited: str
+
+
+class SyncCache:
+    """
+    On-disk state of the sr-regeltest.de download, stored as JSON.
+
+    The parsed question details are kept per url together with the last_edited date they belong to and are reused
+    as long as the question list shows the same date. The list pages of an unfinished download are kept as well
+    (for at most resume_max_age), so an interrupted download continues where it stopped.
+    """
+    resume_max_age = 24 * 60 * 60  # s
+    save_interval = 10  # s
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.details = {}  # type: Dict[str, Dict[str, Any]]
+        self.pages = {}  # type: Dict[int, List[Dict[str, Any]]]
+        self.last_page = None  # type: Optional[int]
+        self.started = time.time()
+        self._last_save = time.monotonic()
+        if not path or not os.path.isfile(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                content = json.load(file)
+            self.details = content["details"]
+            if content["last_page"] is not None and self.started - content["started"] < self.resume_max_age:
+                self.started = content["started"]
+                self.last_page = content["last_page"]
+                self.pages = {int(page_number): entries for page_number, entries in content["pages"].items()}
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            logging.warning(f"Ignoring the download cache {path}: {err}")
+            self.details = {}
+
+    def detail(self, entry: QuestionListEntry) -> Optional[Dict[str, Any]]:
+        cached = self.details.get(entry.url)
+        if cached is None or cached["last_edited"] != entry.last_edited:
+            return None
+        return cached["detail"]
+
+    def store_detail(self, entry: QuestionListEntry, detail: Dict[str, Any]):
+        self.details[entry.url] = {"last_edited": entry.last_edited, "detail": detail}
+
+    def page(self, page_number: int) -> Optional[List[QuestionListEntry]]:
+        if page_number not in self.pages:
+            return None
+        return [QuestionListEntry(**entry) for entry in self.pages[page_number]]
+
+    def store_page(self, page_number: int, entries: List[QuestionListEntry]):
+        self.pages[page_number] = [asdict(entry) for entry in entries]
+
+    def finish(self):
+        # the next download starts with a fresh question list
+        self.pages = {}
+        self.last_page = None
+        self.save()
+
+    def save_periodically(self):
+        if time.monotonic() - self._last_save > self.save_interval:
+            self.save()
+
+    def save(self):
+        self._last_save = time.monotonic()
+        if not self.path:
+            return
+        content = {
+            "started": self.started,
+            "last_page": self.last_page,
+            "pages": self.pages,
+            "details": self.details,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as file:
+                json.dump(content, file)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as err:
+            logging.warning(f"Could not write the download cache: {err}")
+
+
 class LoginFailedException(Exception):
     pass
 
 
+class DownloadFailedException(Exception):
+    pass
+
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+@dataclass
+class DownloadTimings:
+    # summed up durations in s, requests run concurrently, so the sums exceed the wall time
+    requests: int = 0
+    fetch: float = 0
+    parse: float = 0
+    backoff: float = 0
+    wall: float = 0
+
+    def __str__(self):
+        return f"{self.requests} requests in {self.wall:.1f} s (fetch {self.fetch:.1f} s, parse {self.parse:.1f} s, " \
+               f"backoff {self.backoff:.1f} s)"
+
+
+# The parse functions run in worker threads: they get the page as text and return plain data or None if the page is
+# incomplete, which the site sends when it is overloaded.
+
+def _soup(content: str) -> BeautifulSoup:
+    return BeautifulSoup(content, 'lxml')
+
+
+def _parse_last_page(content: str) -> Optional[int]:
+    last_page_link = _soup(content).find(text="Letzte »")
+    if last_page_link is None:
+        return None
+    return int(last_page_link.parent["href"].split("=")[1])
+
+
+def _parse_list_entry(soup_element) -> QuestionListEntry:
+    rows = soup_element.findAll("td")
+
+    question_url = rows[0].find('a').attrs['href']
+    regel_id = rows[0].find('a').contents[0]
+    group_name = rows[1].contents[0]
+
+    try:
+        int(regel_id)
+        regel_id = regel_id.zfill(5)
+        group_id = int(regel_id[0:2])
+        question_id = int(regel_id[2:])
+    except ValueError:
+        group_id = 25
+        question_id = -1
+
+    return QuestionListEntry(
+        question_url,
+        group_id,
+        question_id,
+        group_name,
+        str(datetime.strptime(rows[3].contents[0], '%d.%m.%Y').date()),
+        str(datetime.strptime(rows[4].contents[0], '%d.%m.%Y').date()),
+    )
+
+
+def _parse_question_list(content: str) -> Optional[List[QuestionListEntry]]:
+    table = _soup(content).find("table")
+    if table is None:
+        return None
+    return [_parse_list_entry(row) for row in table.find("tbody").findAll("tr")]
+
+
+def _parse_question_detail(entry: QuestionListEntry, page: str) -> Optional[Dict[str, Any]]:
+    content = _soup(page).findAll("div", {"class": "card-body"})
+    if len(content) == 0:
+        return None
+    question = content[0].findAll("p")[1].contents[0].strip()
+    if len(content[1].findAll("tr", {"class": "wrong-answer"})) > 0:
+        # multiple choice!
+        multiple_choice = []
+        for i, answers in enumerate(content[1].findAll("tr")):
+            multiple_choice_answer = answers.find("td").contents[0].strip()
+            if answers["class"][0] == 'correct-answer':
+                answer_index = i
+                answer_text = multiple_choice_answer
+            multiple_choice += [answers.find("td").contents[0].strip()]
+    else:
+        answer_elements = content[1].find("p")
+        if answer_elements:
+            answer_text = answer_elements.contents[0].strip()
+        else:
+            answer_text = ""
+            print(f"Regelgruppe {entry.group_id} - Regel-ID {entry.question_id} hat eine leere Antwort!")
+        multiple_choice = []
+        answer_index = -1
+    return {
+        "question": question,
+        "answer_index": answer_index,
+        "answer_text": answer_text,
+        "multiple_choice": multiple_choice,
+    }
+
+
+def _timed(function: Callable[[str], R], content: str) -> Tuple[R, float]:
+    started = time.perf_counter()
+    return function(content), time.perf_counter() - started
+
+
+class AdaptiveLimiter:
+    """
+    Async context manager limiting the number of concurrent requests. The limit adapts AIMD-style: every successful
+    request raises it by 1/limit (about +1 per round trip), a throttled one halves it.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def throttled(self, started: float):
+        # requests started before the last decrease were sent with the old limit, they must not halve it again
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(self.minimum, self.limit / 2)
+
+
 class DatasetDownloadDialog(QDialog, Ui_DownloadDialog):
-    def __init__(self, parent):
+    def __init__(self, parent, known_versions: Optional[Dict[Tuple[int, int], Tuple[date, date]]] = None):
         super().__init__(parent)
         self.ui = Ui_DownloadDialog()
         self.ui.setupUi(self)
@@ -63,17 +303,30 @@ class DatasetDownloadDialog(QDialog, Ui_DownloadDialog):
         self.ui.source_combobox.addItem("bfv.sr-regeltest.de")
         self.ui.buttonBox.accepted.connect(self.download_data)
         self.download_thread = None
+        self.known_versions = known_versions or {}
+        self.ui.incremental_checkbox.setChecked(bool(self.known_versions))
+        self.ui.incremental_checkbox.setEnabled(bool(self.known_versions))
 
         self.data = None
 
+    @property
+    def incremental(self) -> bool:
+        # data only contains new and changed questions
+        return self.ui.incremental_checkbox.isChecked()
+
     def download_data(self):
         if self.ui.source_combobox.currentIndex() == 0:
-            downloader = BfvSrRegeltest(self.ui.username_lineedit.text(), self.ui.password_lineedit.text())
+            downloader = BfvSrRegeltest(self.ui.username_lineedit.text(), self.ui.password_lineedit.text(),
+                                        known_versions=self.known_versions if self.incremental else None,
+                                        cache_path=os.path.join(app_dirs.user_cache_dir, download_cache_name))
 
         def login_successful(value: bool):
             if value:
                 result = progress_dialog.exec()
                 if result == QDialog.Rejected:
+                    if self.download_thread.error:
+                        QMessageBox.critical(self, "Fehler",
+                                             f"Der Download ist fehlgeschlagen.\n{self.download_thread.error}")
                     self.reject()
                 else:
                     self.data = self.download_thread.data
@@ -94,12 +347,14 @@ class DatasetDownloadDialog(QDialog, Ui_DownloadDialog):
         self.download_thread = DownloadThread(downloader)
         self.download_thread.download_progress.connect(progress_dialog.ui.progressBar.setValue)
         self.download_thread.completed.connect(progress_dialog.accept)
+        self.download_thread.failed.connect(progress_dialog.reject)
         self.download_thread.start()
 
 
 class DownloadThread(QThread):
     download_progress = Signal(int)
     completed = Signal()
+    failed = Signal(str)
 
     downloaded_items = 0
     max_items = -1
@@ -108,7 +363,8 @@ class DownloadThread(QThread):
     def __init__(self, downloader):
         super(DownloadThread, self).__init__()
         self.downloader = downloader
-        self.data = {"question_groups": [], "questions": []}
+        self.data = {"question_groups": [], "questions": [], "unchanged": []}
+        self.error = None  # type: Optional[str]
 
     def run(self):
         def receive_download_items(value: int):
@@ -123,11 +379,18 @@ class DownloadThread(QThread):
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        regelgruppen_list, regelfragen_list = loop.run_until_complete(self.downloader.download_loop())
-        self.data = {"question_groups": regelgruppen_list, "questions": regelfragen_list}
+        try:
+            regelgruppen_list, regelfragen_list, unchanged = loop.run_until_complete(self.downloader.download_loop())
+        except DownloadFailedException as err:
+            self.error = str(err)
+        else:
+            self.data = {"question_groups": regelgruppen_list, "questions": regelfragen_list, "unchanged": unchanged}
         loop.run_until_complete(asyncio.sleep(0.250))
         loop.close()
-        self.completed.emit()
+        if self.error:
+            self.failed.emit(self.error)
+        else:
+            self.completed.emit()
 
 
 class BfvSrRegeltest(QObject):
@@ -137,16 +400,110 @@ class BfvSrRegeltest(QObject):
     display_text = Signal(str)
     successful_login = Signal(bool)
 
-    def __init__(self, username, password):
+    # the site answers too many parallel requests with 429/503 or pages without content
+    throttle_status = (429, 503)
+    initial_concurrency = 8
+    # pages are parsed in threads to keep the event loop free for the network I/O
+    parser_threads = min(4, os.cpu_count() or 1)
+    request_timeout = 30  # s
+    backoff_base = 0.5  # s
+    backoff_max = 30  # s
+
+    def __init__(self, username, password, max_concurrency: int = 32, max_retries: int = 6,
+                 known_versions: Optional[Dict[Tuple[int, int], Tuple[date, date]]] = None,
+                 cache_path: Optional[str] = None):
+        """
+        known_versions maps (group_id, question_id) of the local questions to their (created, last_edited) dates, see
+        DatabaseConnector.get_question_versions. cache_path is the SyncCache file, None disables the cache.
+        """
         super().__init__()
         self.username = username
         self.password = password
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.known_versions = known_versions or {}
+        self.cache_path = cache_path
+        self.limiter = None  # type: Optional[AdaptiveLimiter]
+        self.cache = None  # type: Optional[SyncCache]
+        self.parser_pool = None  # type: Optional[ThreadPoolExecutor]
+        self.retries = 0
+        self.timings = DownloadTimings()
+
+    @staticmethod
+    def _retry_after(resp) -> float:
+        try:
+            return float(resp.headers.get("Retry-After", 0))
+        except ValueError:
+            # HTTP date, not worth parsing
+            return 0
+
+    async def _get_page(self, session, url: str, parse: Callable[[str], Optional[T]]) -> T:
+        """
+        Downloads url and returns the result of parse, which runs in the parser pool. Throttled requests (429/503,
+        timeouts, connection errors or pages which parse returns None for) are retried up to max_retries times with
+        exponential backoff and full jitter.
+        """
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            content = None
+            retry_after = 0
+            try:
+                async with self.limiter:
+                    fetch_started = time.perf_counter()
+                    async with session.get(url) as resp:
+                        if resp.status in self.throttle_status:
+                            retry_after = self._retry_after(resp)
+                        elif resp.status >= 400:
+                            raise DownloadFailedException(f"{url}: HTTP {resp.status}")
+                        else:
+                            content = await resp.text()
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+                pass
+            self.timings.requests += 1
+            self.timings.fetch += time.perf_counter() - fetch_started
+            if content is not None:
+                result, duration = await asyncio.get_running_loop().run_in_executor(self.parser_pool, _timed,
+                                                                                    parse, content)
+                self.timings.parse += duration
+                if result is not None:
+                    self.limiter.success()
+                    return result
+            self.limiter.throttled(started)
+            if attempt < self.max_retries:
+                self.retries += 1
+                delay = max(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)), retry_after)
+                self.timings.backoff += delay
+                await asyncio.sleep(delay)
+        raise DownloadFailedException(f"{url}: keine Antwort nach {self.max_retries + 1} Versuchen")
+
+    async def _map(self, function: Callable[[T], Awaitable[R]], items: Iterable[T]) -> List[R]:
+        """
+        Runs function for all items from a work queue processed by max_concurrency workers, the actual number of
+        parallel requests is limited by the limiter. The results keep the order of items.
+        """
+        queue = asyncio.Queue()
+        for item in enumerate(items):
+            queue.put_nowait(item)
+        results = [None] * queue.qsize()
+
+        async def worker():
+            while not queue.empty():
+                index, item = queue.get_nowait()
+                results[index] = await function(item)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.max_concurrency, queue.qsize()))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return results
 
     async def login(self, session) -> bool:
         async with session.get("/users/sign_in") as resp:
             r = await resp.text()
 
-        login_page = BeautifulSoup(r, 'html.parser')
+        login_page = _soup(r)
         authenticity_token = login_page.find('input', {'name': 'authenticity_token'})['value']
 
         url = '/users/sign_in'
@@ -162,108 +519,102 @@ class BfvSrRegeltest(QObject):
             return False
         return True
 
-    async def _fetch_question(self, session, soup_element):
-        rows = soup_element.findAll("td")
-
-        question_url = rows[0].find('a').attrs['href']
-        regel_id = rows[0].find('a').contents[0]
-        group_name = rows[1].contents[0]
-
-        try:
-            int(regel_id)
-            regel_id = regel_id.zfill(5)
-            group_id = int(regel_id[0:2])
-            question_id = int(regel_id[2:])
-        except ValueError:
-            group_id = 25
-            question_id = -1
-
-        while True:
-            async with session.get(question_url) as resp:
-                detail_page = await resp.text()
-            detail_page = BeautifulSoup(detail_page, 'html.parser')
-            content = detail_page.findAll("div", {"class": "card-body"})
-            if len(content) != 0:
-                break
-            print("Too many request errors, trying again..")
-        question = content[0].findAll("p")[1].contents[0].strip()
-        if len(content[1].findAll("tr", {"class": "wrong-answer"})) > 0:
-            # multiple choice!
-            multiple_choice = []
-            for i, answers in enumerate(content[1].findAll("tr")):
-                multiple_choice_answer = answers.find("td").contents[0].strip()
-                if answers["class"][0] == 'correct-answer':
-                    answer_index = i
-                    answer_text = multiple_choice_answer
-                multiple_choice += [answers.find("td").contents[0].strip()]
-        else:
-            answer_elements = content[1].find("p")
-            if answer_elements:
-                answer_text = answer_elements.contents[0].strip()
-            else:
-                answer_text = ""
-                print(f"Regelgruppe {group_id} - Regel-ID {question_id} hat eine leere Antwort!")
-            multiple_choice = []
-            answer_index = -1
+    async def _fetch_question(self, session, entry: QuestionListEntry) -> QuestionJSON:
+        detail = self.cache.detail(entry)
+        if detail is None:
+            detail = await self._get_page(session, entry.url, functools.partial(_parse_question_detail, entry))
+            self.cache.store_detail(entry, detail)
+            self.cache.save_periodically()
 
         self.downloaded_element.emit()
 
         return QuestionJSON(
-            group_id,
-            question_id,
-            question,
-            answer_index,
-            answer_text,
-            str(datetime.strptime(rows[3].contents[0], '%d.%m.%Y').date()),
-            str(datetime.strptime(rows[4].contents[0], '%d.%m.%Y').date()),
-            multiple_choice,
-        ), QuestionGroupJSON(group_id, group_name)
-
-    @staticmethod
-    async def _fetch_list(session, page_number: int):
-        async with session.get(f'/questions?page={page_number}') as resp:
-            content = await resp.text()
-        soup = BeautifulSoup(content, 'html.parser')
-        return soup.find("table").find("tbody").findAll("tr")
+            entry.group_id,
+            entry.question_id,
+            detail["question"],
+            detail["answer_index"],
+            detail["answer_text"],
+            entry.created,
+            entry.last_edited,
+            detail["multiple_choice"],
+        )
+
+    async def _fetch_list(self, session, page_number: int) -> List[QuestionListEntry]:
+        entries = self.cache.page(page_number)
+        if entries is None:
+            entries = await self._get_page(session, f'/questions?page={page_number}', _parse_question_list)
+            self.cache.store_page(page_number, entries)
+        return entries
+
+    def _is_unchanged(self, entry: QuestionListEntry) -> bool:
+        version = self.known_versions.get((entry.group_id, entry.question_id))
+        return version is not None and [str(value) for value in version] == [entry.created, entry.last_edited]
 
     async def download_loop(self):
-        connector = aiohttp.TCPConnector(limit_per_host=100)
-        async with aiohttp.ClientSession("https://bfv.sr-regeltest.de", connector=connector) as session:
+        """
+        Downloads the question bank and returns (question groups, questions) as dicts of the sr-regeltest.de export
+        format plus the (group_id, question_id) of the unchanged questions. Questions listed in known_versions with
+        the same created and last_edited dates are unchanged and skipped, the question groups are always complete.
+        """
+        self.limiter = AdaptiveLimiter(min(self.initial_concurrency, self.max_concurrency), 1, self.max_concurrency)
+        self.retries = 0
+        self.timings = DownloadTimings()
+        started = time.perf_counter()
+        self.cache = SyncCache(self.cache_path)
+        self.parser_pool = ThreadPoolExecutor(self.parser_threads, thread_name_prefix="parser")
+        connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(self.base_url, connector=connector, timeout=timeout) as session:
             self.successful_login.emit(await self.login(session))
             self.display_text.emit("Sammle alle verfügbaren Fragen...")
-            async with session.get('/questions?page=1') as resp:
-                question_page_1 = await resp.text()
-            soup = BeautifulSoup(question_page_1, 'html.parser')
-            last_page = int(soup.find(text="Letzte »").parent["href"].split("=")[1])
-
-            tasks = [asyncio.ensure_future(self._fetch_list(session, page_number)) for page_number in
-                     range(1, last_page + 1)]
-            regelfragen_tables = [item for sublist in await asyncio.gather(*tasks) for item in sublist]
-            self.display_text.emit(f"{len(regelfragen_tables)} Regelfragen gefunden! Downloade...")
-            self.available_questions.emit(len(regelfragen_tables))
-
-            tasks = [asyncio.ensure_future(self._fetch_question(session, soup_set)) for soup_set in
-                     regelfragen_tables]
-            responses = await asyncio.gather(*tasks)
-
-            regelfragen, regelgruppen = list(zip(*responses))
-
-            regelgruppen_sorted = sorted(regelgruppen, key=lambda x: x.id)
-            re_id = defaultdict(lambda: 1)
-
-            for question in regelfragen:
-                if question.question_id == -1:
-                    question.question_id = re_id[question.group_id]
-                    re_id[question.group_id] += 1
-
-            regelgruppen_list = [regelgruppe.toDict() for regelgruppe in regelgruppen_sorted]
-            regelgruppen_filtered = []
-            for group in regelgruppen_list:
-                if group not in regelgruppen_filtered:
-                    regelgruppen_filtered += [group]
+            try:
+                last_page = self.cache.last_page
+                if last_page is None:
+                    last_page = await self._get_page(session, '/questions?page=1', _parse_last_page)
+                    self.cache.last_page = last_page
+
+                entries = [item for sublist in
+                           await self._map(lambda page_number: self._fetch_list(session, page_number),
+                                           range(1, last_page + 1))
+                           for item in sublist]
+                self.cache.save()
+
+                # questions without a numeric id are numbered in list order
+                re_id = defaultdict(lambda: 1)
+                for entry in entries:
+                    if entry.question_id == -1:
+                        entry.question_id = re_id[entry.group_id]
+                        re_id[entry.group_id] += 1
+
+                changed = []
+                unchanged = []
+                for entry in entries:
+                    if self._is_unchanged(entry):
+                        unchanged.append((entry.group_id, entry.question_id))
+                    else:
+                        changed.append(entry)
+                if len(changed) == len(entries):
+                    self.display_text.emit(f"{len(entries)} Regelfragen gefunden! Downloade...")
+                else:
+                    self.display_text.emit(f"{len(entries)} Regelfragen gefunden, {len(changed)} davon neu oder "
+                                           f"geändert! Downloade...")
+                self.available_questions.emit(len(changed))
+
+                regelfragen = await self._map(lambda entry_: self._fetch_question(session, entry_), changed)
+            finally:
+                self.cache.save()
+                self.parser_pool.shutdown(wait=False)
+                self.timings.wall = time.perf_counter() - started
+                logger.info(f"Download: {self.timings}, {self.retries} retries, "
+                            f"final concurrency {int(self.limiter.limit)}")
+            self.cache.finish()
+
+            regelgruppen = {entry.group_id: QuestionGroupJSON(entry.group_id, entry.group_name) for entry in
+                            reversed(entries)}
+            regelgruppen_list = [regelgruppen[group_id].toDict() for group_id in sorted(regelgruppen)]
             regelfragen_list = [regelfrage.toDict() for regelfrage in regelfragen]
 
-        return regelgruppen_filtered, regelfragen_list
+        return regelgruppen_list, regelfragen_list, unchanged
 
 
 class DownloadProgress(QDialog, Ui_DownloadProgress):
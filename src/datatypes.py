@@ -1,17 +1,22 @@
+from __future__ import annotations
+
 import logging
 import re
 import uuid
 from collections import namedtuple
+from dataclasses import dataclass, field
 from datetime import datetime, date
 from enum import Enum, auto, IntEnum
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Tuple, BinaryIO, Optional, Callable, Any, TYPE_CHECKING
 
-import bs4
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, BLOB, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, BLOB, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 
 from src.basic_config import Base, EagerDefault
 
+if TYPE_CHECKING:
+    import bs4
+
 default_date = datetime(1970, 1, 1)
 
 
@@ -56,6 +61,10 @@ class RegeltestDesign(Base):
 
 class RegeltestQuestion(Base):
     __tablename__ = 'regeltest_question'
+    __table_args__ = (
+        Index('ix_regeltest_question_question_id', 'question_id'),  # usage count of a question
+        Index('ix_regeltest_question_regeltest_id', 'regeltest_id', 'question_id'),  # questions of a regeltest
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
 
     regeltest_id = Column(String, ForeignKey('regeltest.id'))
@@ -95,6 +104,9 @@ class Regeltest(Base):
 
 class Statistics(Base):
     __tablename__ = 'statistics'
+    __table_args__ = (
+        Index('ix_statistics_last_tested', 'last_tested'),
+    )
 
     question_signature = Column(String, ForeignKey("question.signature"), primary_key=True)
     question = relationship("Question", back_populates="statistics")
@@ -182,6 +194,10 @@ class FilterOption(Enum):
 
 class Question(Base):
     __tablename__ = 'question'
+    __table_args__ = (
+        # questions of a group, optionally restricted to (no) multiple choice
+        Index('ix_question_group_id_answer_index', 'group_id', 'answer_index'),
+    )
 
     QuestionValues = namedtuple('QuestionValues', ['table_value', 'table_tooltip', 'table_checkbox'],
                                 defaults=[None, None])
@@ -200,6 +216,8 @@ class Question(Base):
     created = Column(Date, default=date.today)
     last_edited = Column(Date, default=date.today)
     signature = Column(String, default=(lambda: uuid.uuid4().hex), primary_key=True)
+    # set by merge imports if the question is not part of the dataset anymore, removed questions are hidden
+    removed = Column(Date, default=None)
 
     parameters = {
         'group_id': QuestionParameters(table_header="Fragengruppe", filter_options=None, datatype=int),
@@ -246,8 +264,14 @@ class Question(Base):
                                                               FilterOption.equal), datatype=int),
     }  # type: Dict[str, QuestionParameters]
 
-    # noinspection PyArgumentList
     def values(self, key) -> QuestionValues:
+        return self.table_values()[key]
+
+    # noinspection PyArgumentList
+    def table_values(self, regeltest_count: Optional[int] = None) -> Dict[str, QuestionValues]:
+        # regeltest_count can be passed in if it was already queried, otherwise the relationship is loaded
+        if regeltest_count is None:
+            regeltest_count = len(self.regeltest_questions)
         return {
             'group_id': Question.QuestionValues(table_value=self.group_id),
             'question_id': Question.QuestionValues(table_value=self.question_id),
@@ -265,8 +289,8 @@ class Question(Base):
             'positive_tests': Question.QuestionValues(table_value=self._statistics('positive_tests')),
             'negative_tests': Question.QuestionValues(table_value=self._statistics('negative_tests')),
             'streak': Question.QuestionValues(table_value=self._statistics('streak')),
-            'regeltest_count': Question.QuestionValues(table_value=len(self.regeltest_questions))
-        }[key]
+            'regeltest_count': Question.QuestionValues(table_value=regeltest_count)
+        }
 
     def _statistics(self, key):
         if not self.statistics:
@@ -305,6 +329,87 @@ class Question(Base):
                f", question_id={self.group_id!r} {self.question_id!r})"
 
 
+# FTS5 full-text index over question, answer and multiple choice texts. The rowids of question are not stable (it has
+# no INTEGER PRIMARY KEY, so e.g. VACUUM may renumber them), the index rows are keyed by the ids of
+# question_search_key instead, which maps them to the question signatures.
+# unicode61 with remove_diacritics folds umlauts (ä -> a), so searches match with and without them. It keeps ß though,
+# so the indexed texts and the search (see fold_search_text) spell it ss.
+_fold_search_text = "replace(replace({}, 'ß', 'ss'), 'ẞ', 'SS')"
+_mchoice_search_text = _fold_search_text.format(
+    "(SELECT group_concat(text, ' ') FROM multiple_choice WHERE question_signature = {})")
+_question_search_key = "(SELECT id FROM question_search_key WHERE signature = {})"
+
+question_search_tables = (
+    "CREATE TABLE IF NOT EXISTS question_search_key (id INTEGER PRIMARY KEY, signature VARCHAR NOT NULL UNIQUE)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS question_search USING fts5("
+    "question, answer_text, multiple_choice, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+)
+question_search_triggers = {
+    'question_search_insert':
+        "AFTER INSERT ON question BEGIN "
+        "INSERT OR IGNORE INTO question_search_key (signature) VALUES (new.signature); "
+        "INSERT OR REPLACE INTO question_search (rowid, question, answer_text, multiple_choice) "
+        f"VALUES ({_question_search_key.format('new.signature')}, {_fold_search_text.format('new.question')}, "
+        f"{_fold_search_text.format('new.answer_text')}, {_mchoice_search_text.format('new.signature')}); END",
+    'question_search_update':
+        "AFTER UPDATE OF question, answer_text, signature ON question BEGIN "
+        "UPDATE question_search_key SET signature = new.signature WHERE signature = old.signature; "
+        f"UPDATE question_search SET question = {_fold_search_text.format('new.question')}, "
+        f"answer_text = {_fold_search_text.format('new.answer_text')}, "
+        f"multiple_choice = {_mchoice_search_text.format('new.signature')} "
+        f"WHERE rowid = {_question_search_key.format('new.signature')}; END",
+    'question_search_delete':
+        "AFTER DELETE ON question BEGIN "
+        f"DELETE FROM question_search WHERE rowid = {_question_search_key.format('old.signature')}; "
+        "DELETE FROM question_search_key WHERE signature = old.signature; END",
+    'multiple_choice_search_insert':
+        "AFTER INSERT ON multiple_choice BEGIN "
+        f"UPDATE question_search SET multiple_choice = {_mchoice_search_text.format('new.question_signature')} "
+        f"WHERE rowid = {_question_search_key.format('new.question_signature')}; END",
+    'multiple_choice_search_update':
+        "AFTER UPDATE ON multiple_choice BEGIN "
+        f"UPDATE question_search SET multiple_choice = {_mchoice_search_text.format('old.question_signature')} "
+        f"WHERE rowid = {_question_search_key.format('old.question_signature')}; "
+        f"UPDATE question_search SET multiple_choice = {_mchoice_search_text.format('new.question_signature')} "
+        f"WHERE rowid = {_question_search_key.format('new.question_signature')}; END",
+    'multiple_choice_search_delete':
+        "AFTER DELETE ON multiple_choice BEGIN "
+        f"UPDATE question_search SET multiple_choice = {_mchoice_search_text.format('old.question_signature')} "
+        f"WHERE rowid = {_question_search_key.format('old.question_signature')}; END",
+}  # type: Dict[str, str]
+question_search_rebuild = (
+    "DELETE FROM question_search",
+    "DELETE FROM question_search_key",
+    "INSERT INTO question_search_key (signature) SELECT signature FROM question",
+    "INSERT INTO question_search (rowid, question, answer_text, multiple_choice) "
+    f"SELECT question_search_key.id, {_fold_search_text.format('question.question')}, "
+    f"{_fold_search_text.format('question.answer_text')}, {_fold_search_text.format('mchoice.text')} FROM question "
+    "JOIN question_search_key ON question_search_key.signature = question.signature "
+    "LEFT JOIN (SELECT question_signature, group_concat(text, ' ') AS text FROM multiple_choice "
+    "GROUP BY question_signature) AS mchoice ON mchoice.question_signature = question.signature",
+)
+
+
+def fold_search_text(text: str) -> str:
+    # same folding as _fold_search_text for the search input
+    return text.replace('ß', 'ss').replace('ẞ', 'SS')
+
+
+def create_search_index(execute: Callable[[str], Any]):
+    # execute runs a single SQL statement, so this works with a Connection as well as in migrations (op.execute)
+    for table in question_search_tables:
+        execute(table)
+    for name, trigger in question_search_triggers.items():
+        execute(f"CREATE TRIGGER IF NOT EXISTS {name} {trigger}")
+    for statement in question_search_rebuild:
+        execute(statement)
+
+
+def drop_search_triggers(execute: Callable[[str], Any]):
+    for name in question_search_triggers:
+        execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
 def create_question_groups(groups: bs4.element.Tag) -> List[QuestionGroup]:
     texts = groups.find_all("GRUPPENTEXT")
     texts = [item.contents[0].strip() for item in texts]
@@ -314,73 +419,181 @@ def create_question_groups(groups: bs4.element.Tag) -> List[QuestionGroup]:
     return [QuestionGroup(id=number, name=text) for text, number in zip(texts, numbers)]
 
 
-def create_questions_and_mchoice(rules_xml):
-    def create_mchoice(mchoice_):
-        if not mchoice_:
-            # empty -> no mchoice question
-            return []
-        mchoice_cleaned = mchoice_.strip().split("\n")
-        if len(mchoice_cleaned) == 1 and len(mchoice_cleaned[0]) <= 1:
-            # bullshit input..
-            return []
+rule_tags = ("LNR", "SIGNATUR", "FRAGE", "MCHOICE", "ANTWORT", "ERST", "AEND")
+
+
+def _create_mchoice(mchoice_):
+    if not mchoice_:
+        # empty -> no mchoice question
+        return []
+    mchoice_cleaned = mchoice_.strip().split("\n")
+    if len(mchoice_cleaned) == 1 and len(mchoice_cleaned[0]) <= 1:
+        # bullshit input..
+        return []
+
+    assert len(
+        mchoice_cleaned) == 3, f"More than three possible answers?! Wtf.. '{mchoice_}' v. '{mchoice_cleaned}'"
+    # removes the a/b/c () in front :)
+    return [re.sub(r"^[abc] *\( *\) *", "", i) for i in mchoice_cleaned]
+
+
+def _create_question(rule: Dict[str, str], group_id: int, question_id: int, signature: str) \
+        -> Tuple[Question, List[MultipleChoice]]:
+    question = rule["FRAGE"].strip()
+    mchoice = _create_mchoice(rule["MCHOICE"])
+    mchoice = [MultipleChoice(question_signature=signature, index=i, text=mchoice) for i, mchoice in
+               enumerate(mchoice)]
+    answer = rule["ANTWORT"].strip()
+    if not mchoice:
+        mchoice_index = -1
+    else:
+        if re.match(r" *\(*a\)* *", answer):
+            mchoice_index = 0
+        elif re.match(r" *\(*b\)* *", answer):
+            mchoice_index = 1
+        elif re.match(r" *\(*c\)* *", answer):
+            mchoice_index = 2
+        else:
+            logging.info(f"{question} is multiple choice, but has no answer candidate.. choice is ignored")
+            mchoice_index = -1
+            mchoice = []
+    if mchoice_index >= 0:
+        answer = re.sub(r"^ *\(*[abc] *\)* *", "", answer)
+    created = rule["ERST"].strip()
+    changed = rule["AEND"].strip()
+    if created:
+        created = datetime.strptime(created, "%d.%m.%Y")
+    else:
+        created = default_date
+    if changed:
+        changed = datetime.strptime(changed, "%d.%m.%Y")
+        if changed < created:
+            changed = created
+    else:
+        changed = created
+    return Question(question_id=question_id, group_id=group_id, question=question, answer_index=mchoice_index,
+                    answer_text=answer, created=created, last_edited=changed, signature=signature), mchoice
+
 
-        assert len(
-            mchoice_cleaned) == 3, f"More than three possible answers?! Wtf.. '{mchoice_}' v. '{mchoice_cleaned}'"
-        # removes the a/b/c () in front :)
-        return [re.sub(r"^[abc] *\( *\) *", "", i) for i in mchoice_cleaned]
+@dataclass
+class ImportReport:
+    imported: int = 0
+    duplicate_ids: List[Tuple[int, int]] = field(default_factory=list)  # (group_id, question_id)
+    duplicate_signatures: List[str] = field(default_factory=list)
 
-    rules_index = []
-    signatures = []
-    rules = []
-    multiple_choice = []
-    for rule in rules_xml:
-        lnr = rule.find("LNR").contents[0].strip()
+    def __bool__(self):
+        # True if anything was dropped
+        return bool(self.duplicate_ids or self.duplicate_signatures)
+
+    def __str__(self):
+        return f"{self.imported} Fragen importiert, {len(self.duplicate_ids)} doppelte Regelnummern und " \
+               f"{len(self.duplicate_signatures)} doppelte Signaturen übersprungen"
+
+
+@dataclass
+class MergeReport:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+    def __str__(self):
+        return f"{self.inserted} Fragen neu, {self.updated} geändert, {self.unchanged} unverändert, " \
+               f"{self.removed} entfernt"
+
+
+def iter_questions_and_mchoice(rules: Iterable[Dict[str, str]], report: Optional[ImportReport] = None) \
+        -> Iterator[Tuple[Question, List[MultipleChoice]]]:
+    # rules are plain tag -> text mappings, so BeautifulSoup and iterparse input share the same conversion
+    if report is None:
+        report = ImportReport()
+    rules_index = set()
+    signatures = set()
+    for rule in rules:
+        lnr = rule["LNR"].strip()
         group_id = int(lnr[0:2])
         question_id = int(lnr[2:])
-        signature = rule.find("SIGNATUR").contents[0].strip()
+        signature = rule["SIGNATUR"].strip()
         if (group_id, question_id) in rules_index:
             # duplicated questions... wtf
+            report.duplicate_ids += [(group_id, question_id)]
             continue
-        else:
-            rules_index += [(group_id, question_id)]
+        rules_index.add((group_id, question_id))
         if signature in signatures:
             # duplicate question... again
+            report.duplicate_signatures += [signature]
             continue
-        else:
-            signatures += [signature]
-        question = rule.find("FRAGE").contents[0].strip()
-        mchoice = create_mchoice(rule.find("MCHOICE").contents[0])
-        mchoice = [MultipleChoice(question_signature=signature, index=i, text=mchoice) for i, mchoice in
-                   enumerate(mchoice)]
-        answer = rule.find("ANTWORT").contents[0].strip()
-        if not mchoice:
-            mchoice_index = -1
-        else:
-            if re.match(r" *\(*a\)* *", answer):
-                mchoice_index = 0
-            elif re.match(r" *\(*b\)* *", answer):
-                mchoice_index = 1
-            elif re.match(r" *\(*c\)* *", answer):
-                mchoice_index = 2
-            else:
-                logging.info(f"{question} is multiple choice, but has no answer candidate.. choice is ignored")
-                mchoice_index = -1
-                mchoice = []
+        signatures.add(signature)
+        report.imported += 1
+        yield _create_question(rule, group_id, question_id, signature)
+
+
+def create_questions_and_mchoice(rules_xml, report: Optional[ImportReport] = None):
+    def rule_fields(rule: bs4.element.Tag) -> Dict[str, str]:
+        return {tag: rule.find(tag).contents[0] for tag in rule_tags}
+
+    rules = []
+    multiple_choice = []
+    for question, mchoice in iter_questions_and_mchoice((rule_fields(rule) for rule in rules_xml), report):
+        rules += [question]
         multiple_choice += mchoice
-        if mchoice_index >= 0:
-            answer = re.sub(r"^ *\(*[abc] *\)* *", "", answer)
-        created = rule.find("ERST").contents[0].strip()
-        changed = rule.find("AEND").contents[0].strip()
-        if created:
-            created = datetime.strptime(rule.find("ERST").contents[0].strip(), "%d.%m.%Y")
-        else:
-            created = default_date
-        if changed:
-            changed = datetime.strptime(rule.find("AEND").contents[0].strip(), "%d.%m.%Y")
-            if changed < created:
-                changed = created
-        else:
-            changed = created
-        rules += [Question(question_id=question_id, group_id=group_id, question=question, answer_index=mchoice_index,
-                           answer_text=answer, created=created, last_edited=changed, signature=signature)]
     return rules, multiple_choice
+
+
+def iterparse_origformat(file: BinaryIO, batch_size: int = 1000, report: Optional[ImportReport] = None) \
+        -> Iterator[List[QuestionGroup | Question | MultipleChoice]]:
+    """
+    Streaming counterpart of create_question_groups / create_questions_and_mchoice.
+
+    Parses the DFB XML incrementally and yields batches of at most batch_size questions (plus their multiple
+    choice options and any question groups seen so far). Dropped duplicates are collected in report. Finished
+    elements are cleared right away, so the memory footprint does not grow with the size of the file.
+    """
+    from lxml import etree
+
+    def rule_fields(events) -> Iterator[Dict[str, str]]:
+        # yields the REGELSATZ elements as tag -> text mapping and frees them afterwards
+        fields = {}
+        for event, element in events:
+            if element.tag in rule_tags:
+                fields[element.tag] = element.text or ""
+            elif element.tag == "REGELSATZ":
+                yield {tag: fields.get(tag, "") for tag in rule_tags}
+                fields = {}
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+    question_groups = []
+    group_texts = []
+    group_numbers = []
+
+    def group_events(events):
+        # collects the GRUPPEN block on the fly and forwards everything else
+        for event, element in events:
+            if element.tag == "GRUPPENTEXT":
+                group_texts.append((element.text or "").strip())
+            elif element.tag == "GRUPPENNR":
+                group_numbers.append(int(element.text))
+            elif element.tag == "GRUPPEN":
+                question_groups.extend(QuestionGroup(id=number, name=text)
+                                       for text, number in zip(group_texts, group_numbers))
+                element.clear()
+            yield event, element
+
+    events = etree.iterparse(file, events=("end",), huge_tree=True)
+    batch = []
+    question_count = 0
+    for question, mchoice in iter_questions_and_mchoice(rule_fields(group_events(events)), report):
+        batch += question_groups
+        question_groups.clear()
+        batch += [question]
+        batch += mchoice
+        question_count += 1
+        if question_count >= batch_size:
+            yield batch
+            batch = []
+            question_count = 0
+    batch += question_groups
+    if batch:
+        yield batch
@@ -6,12 +6,9 @@ import random
 import webbrowser
 from typing import TYPE_CHECKING
 
-import pptx
-from PIL import Image
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtWidgets import QWidget, QDialog, QApplication, QListWidgetItem, QListWidget
 
-from src import document_builder
 from src.basic_config import base_path
 from src.database import db
 from src.datatypes import Regeltest, RegeltestIcon, SelfTestMode
@@ -62,6 +59,8 @@ def generate_powerpoint_questionsets(questions_a: List[Question]):
 
 
 class RegeltestCreatorDockwidget(QWidget, Ui_regeltest_creator_dockwidget):
+    regeltest_archived = Signal()
+
     def __init__(self, main_window: MainWindow):
         super(RegeltestCreatorDockwidget, self).__init__(main_window)
         self.ui = Ui_regeltest_creator_dockwidget()
@@ -92,9 +91,7 @@ class RegeltestCreatorDockwidget(QWidget, Ui_regeltest_creator_dockwidget):
                 self.ui.regeltest_list.add_question(question)
 
     def create_regeltest(self):
-        questions = []
-        for signature in self.ui.regeltest_list.questions:
-            questions += [db.get_question(signature)]
+        questions = db.get_questions_by_signatures(self.ui.regeltest_list.questions)
         settings = RegeltestSaveDialog(questions, self)
         settings.ui.title_edit.setFocus()
         result = settings.exec()
@@ -103,6 +100,11 @@ class RegeltestCreatorDockwidget(QWidget, Ui_regeltest_creator_dockwidget):
         csv_path = settings.ui.csv_edit.text()
         archive_regeltest = settings.ui.regeltest_archive_checkBox.isChecked()
         if result == QDialog.Accepted:
+            # the export libraries are imported on first use, they are slow to load
+            import pptx
+            from PIL import Image
+            from src import document_builder
+
             selected_questions = settings.get_questions()
             QApplication.setOverrideCursor(Qt.WaitCursor)
             if settings.ui.icon_path_edit.text():
@@ -115,6 +117,7 @@ class RegeltestCreatorDockwidget(QWidget, Ui_regeltest_creator_dockwidget):
                 regeltest = Regeltest(title=settings.ui.title_edit.text(), icon=icon_db,
                                       selected_questions=selected_questions)
                 db.add_object(regeltest)
+                self.regeltest_archived.emit()
             if pdf_path:
                 document_builder.create_document(selected_questions, pdf_path, settings.ui.title_edit.text(),
                                                  icon=icon, font_size=settings.ui.fontsize_spinBox.value())
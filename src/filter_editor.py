@@ -1,5 +1,5 @@
 from datetime import datetime, date
-from typing import Dict, Tuple, Callable, Any, Optional
+from typing import Dict, Tuple, Any, Optional
 
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QDialog, QLineEdit, QCheckBox, QDateEdit, QSpinBox, QPushButton, QDialogButtonBox
@@ -129,36 +129,3 @@ class FilterEditor(QDialog, Ui_FilterEditor):
     def current_configuration(self) -> Tuple[str, FilterOption, Any]:
         dict_key, _, filter_option = self.__current_selection_state()
         return dict_key, filter_option, self.__get_filter_data()
-
-    def create_filter(self) -> Tuple[str, Callable]:
-        # ('answer_text', lambda x: 'FaD' in x)
-        dict_key, parameters, filter_option = self.__current_selection_state()
-
-        value = self.__get_filter_data()
-        if filter_option == FilterOption.smaller_equal:
-            def filter_callable(x):
-                return value >= x
-        elif filter_option == FilterOption.smaller:
-            def filter_callable(x):
-                return value > x
-        elif filter_option == FilterOption.larger_equal:
-            def filter_callable(x):
-                return value <= x
-        elif filter_option == FilterOption.larger:
-            def filter_callable(x):
-                return value < x
-        elif filter_option == FilterOption.equal:
-            def filter_callable(x):
-                return value == x
-        elif filter_option == FilterOption.contains:
-            def filter_callable(x):
-                return value.lower() in x.lower()
-        else:
-            raise ValueError('Invalid FilterOption!')
-
-        def extended_filter(x):
-            if not x:
-                return False
-            return filter_callable(x)
-
-        return dict_key, extended_filter
@@ -1,21 +1,30 @@
+from __future__ import annotations
+
 import datetime
 import json
+import logging
 from enum import Enum, auto, IntEnum
-from typing import Dict, Any
+from typing import Dict, Any, Optional, TextIO, Iterable, Iterator, Tuple, List, Callable, TYPE_CHECKING
 
-from PySide6.QtCore import QCoreApplication, Qt
-from PySide6.QtWidgets import QMainWindow, QWidget, QFileDialog, QApplication, QMessageBox, QDialog
-from bs4 import BeautifulSoup
+from PySide6.QtCore import QCoreApplication, Qt, QThread, Signal
+from PySide6.QtGui import QCloseEvent
+from PySide6.QtWidgets import QMainWindow, QWidget, QFileDialog, QApplication, QMessageBox, QDialog, \
+    QProgressDialog
 
 from src.basic_config import app_version, check_for_update, display_name, is_bundled
-from src.database import db
-from src.dataset_downloader import DatasetDownloadDialog
-from src.datatypes import create_question_groups, create_questions_and_mchoice, QuestionGroup, Question, MultipleChoice
+from src.database import db, SnapshotError
+from src.datatypes import create_question_groups, create_questions_and_mchoice, QuestionGroup, Question, \
+    MultipleChoice, iterparse_origformat, ImportReport
 from src.dock_widgets import RegeltestCreatorDockwidget, SelfTestDockWidget
 from src.main_widgets import FirstSetupWidget, QuestionOverviewWidget, SelfTestWidget
 from src.regeltest_management import PreviousRegeltests
 from src.ui_mainwindow import Ui_MainWindow
-from src.updater import UpdateChecker
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+
+snapshot_filter = "RegeltestCreator Snapshot (*.rcsnap)"
 
 
 class FilterMode(Enum):
@@ -30,73 +39,207 @@ class ApplicationMode(IntEnum):
     regeltest_setup = 3
 
 
+def _question_group_from_json(question_group: Dict[str, Any]) -> QuestionGroup:
+    return QuestionGroup(
+        id=question_group["id"],
+        name=question_group["name"]
+    )
+
+
+def _question_from_json(question: Dict[str, Any]) -> Question:
+    multiple_choice = []
+    answer_text = question["answer_text"]
+    answer_index = question["answer_index"]
+    if question["multiple_choice"]:
+        for i, answer_option in enumerate(question["multiple_choice"]):
+            multiple_choice += [MultipleChoice(index=i, text=answer_option)]
+        answer_text = multiple_choice[answer_index].text
+    return Question(
+        group_id=question["group_id"],
+        question_id=question["question_id"],
+        question=question["question"],
+        answer_index=answer_index,
+        answer_text=answer_text,
+        created=datetime.datetime.strptime(question["created"], '%Y-%m-%d').date(),
+        last_edited=datetime.datetime.strptime(question["last_edited"], '%Y-%m-%d').date(),
+        multiple_choice=multiple_choice
+    )
+
+
 def read_in_sr_regeltest_de(json_content: Dict[str, Any]):
-    question_groups = []
-    questions = []
-    for question_group in json_content["question_groups"]:
-        question_groups += [QuestionGroup(
-            id=question_group["id"],
-            name=question_group["name"]
-        )]
-    for question in json_content["questions"]:
-        multiple_choice = []
-        answer_text = question["answer_text"]
-        answer_index = question["answer_index"]
-        if question["multiple_choice"]:
-            for i, answer_option in enumerate(question["multiple_choice"]):
-                multiple_choice += [MultipleChoice(index=i, text=answer_option)]
-            answer_text = multiple_choice[answer_index].text
-        questions += [Question(
-            group_id=question["group_id"],
-            question_id=question["question_id"],
-            question=question["question"],
-            answer_index=answer_index,
-            answer_text=answer_text,
-            created=datetime.datetime.strptime(question["created"], '%Y-%m-%d').date(),
-            last_edited=datetime.datetime.strptime(question["last_edited"], '%Y-%m-%d').date(),
-            multiple_choice=multiple_choice
-        )]
+    question_groups = [_question_group_from_json(question_group) for question_group in
+                       json_content["question_groups"]]
+    questions = [_question_from_json(question) for question in json_content["questions"]]
     return question_groups, questions
 
 
-def read_in_origformat(soup_content: BeautifulSoup):
+class JSONStreamReader:
+    """
+    Incremental reader for JSON documents of the form {"key": [record, ...], ...}.
+
+    Only one record is decoded at a time and consumed input is dropped from the buffer, so the memory usage is
+    bounded by the read chunk size plus the largest single record.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = 65536):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON document, got {self.buffer[self.pos]!r}")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self.buffer) and self._fill():
+                # the value might have been cut off at the end of the buffer (e.g. a number), decode it again
+                continue
+            self.pos = end
+            return value
+
+    def records(self, keys: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        # yields (key, record) for every element of the top level arrays named in keys, other values are skipped
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key in keys and self._peek() == "[":
+                self.pos += 1
+                if self._peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self._value()
+                        if self._peek() != ",":
+                            break
+                        self.pos += 1
+                    self._expect("]")
+            else:
+                self._value()
+            if self._peek() != ",":
+                break
+            self.pos += 1
+        self._expect("}")
+
+
+def iter_sr_regeltest_de(file: TextIO, batch_size: int = 1000) -> Iterator[List[QuestionGroup | Question]]:
+    # streaming counterpart of read_in_sr_regeltest_de
+    batch = []
+    for key, record in JSONStreamReader(file).records(("question_groups", "questions")):
+        if key == "question_groups":
+            batch += [_question_group_from_json(record)]
+        else:
+            batch += [_question_from_json(record)]
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_sr_regeltest_de(file: TextIO, question_groups: Iterable[QuestionGroup], questions: Iterable[Question],
+                          progress: Optional[Callable[[], Any]] = None, progress_interval: int = 500):
+    # writes the same document as json.dump({"question_groups": [...], "questions": [...]}) one record at a time
+    file.write('{"question_groups": [')
+    for i, question_group in enumerate(question_groups):
+        if i:
+            file.write(", ")
+        file.write(json.dumps(question_group.export()))
+    file.write('], "questions": [')
+    for i, question in enumerate(questions):
+        if i:
+            file.write(", ")
+        file.write(json.dumps(question.export()))
+        if progress and i % progress_interval == 0:
+            progress()
+    file.write("]}")
+
+
+def read_in_origformat(soup_content: BeautifulSoup, report: Optional[ImportReport] = None):
     question_groups = create_question_groups(soup_content.find("GRUPPEN"))
-    questions, mchoice = create_questions_and_mchoice(soup_content("REGELSATZ"))
+    questions, mchoice = create_questions_and_mchoice(soup_content("REGELSATZ"), report)
     return question_groups, questions, mchoice
 
 
+def import_dataset(datasets: Iterable[List[QuestionGroup | Question | MultipleChoice]],
+                   unchanged: Iterable[Tuple[int, int]] = ()):
+    # an existing dataset is merged to keep statistics and regeltests, an empty database takes the bulk load path
+    if db.has_dataset():
+        report = db.merge_import(datasets, unchanged)
+        logging.info(f"Merge import: {report}")
+    else:
+        db.bulk_fill_database(datasets)
+
+
 def load_file_dataset(parent: QWidget, reset_cursor=True) -> bool:
-    datasets = []
     filter_sr_regeltest_de = "sr-regeltest.de Export (*.json)"
     filter_orig = "DFB Regeldaten (*.xml)"
     file_name = QFileDialog.getOpenFileName(parent, caption="Fragendatei öffnen",
-                                            filter=f"{filter_sr_regeltest_de};;{filter_orig}")
+                                            filter=f"{filter_sr_regeltest_de};;{filter_orig};;{snapshot_filter}")
     if len(file_name) == 0 or file_name[0] == "":
         return False
     QApplication.setOverrideCursor(Qt.WaitCursor)
     if file_name[1] == filter_orig:
+        report = ImportReport()
         with open(file_name[0], 'rb') as file:
-            soup_content = BeautifulSoup(file, "lxml-xml")
-        datasets = read_in_origformat(soup_content)
+            import_dataset(iterparse_origformat(file, report=report))
+        if report:
+            logging.warning(f"{report}: {report.duplicate_ids} / {report.duplicate_signatures}")
     elif file_name[1] == filter_sr_regeltest_de:
         with open(file_name[0], 'r', encoding='utf-8') as file:
-            json_content = json.load(file)
-        datasets = read_in_sr_regeltest_de(json_content)
-    db.clear_database()
-    for dataset in datasets:
-        db.fill_database(dataset)
+            import_dataset(iter_sr_regeltest_de(file))
+    elif file_name[1] == snapshot_filter:
+        try:
+            report = db.load_snapshot(file_name[0])
+            logging.info(f"Snapshot import: {report}")
+        except SnapshotError as err:
+            QApplication.restoreOverrideCursor()
+            QMessageBox(QMessageBox.Icon.Critical, "Fehler", f"Der Snapshot konnte nicht geladen werden.\n{err}",
+                        parent=parent).exec()
+            return False
     if reset_cursor:
         QApplication.restoreOverrideCursor()
     return True
 
 
 def load_online_dataset(parent: QWidget, reset_cursor=True) -> bool:
-    dataset_downloader = DatasetDownloadDialog(parent)
+    # aiohttp and BeautifulSoup are only needed for downloads
+    from src.dataset_downloader import DatasetDownloadDialog
+
+    dataset_downloader = DatasetDownloadDialog(parent, db.get_question_versions() if db else None)
     if dataset_downloader.exec() == QDialog.Accepted:
         datasets = read_in_sr_regeltest_de(dataset_downloader.data)
-        db.clear_database()
-        for dataset in datasets:
-            db.fill_database(dataset)
+        import_dataset(datasets, dataset_downloader.data["unchanged"])
         if reset_cursor:
             QApplication.restoreOverrideCursor()
         return True
@@ -105,26 +248,52 @@ def load_online_dataset(parent: QWidget, reset_cursor=True) -> bool:
 
 
 def save_dataset(parent: QWidget):
-    file_name = QFileDialog.getSaveFileName(parent, caption="Fragendatei speichern", filter="DFB Regeldaten (*.json)")
+    file_name = QFileDialog.getSaveFileName(parent, caption="Fragendatei speichern",
+                                            filter=f"DFB Regeldaten (*.json);;{snapshot_filter}")
     if len(file_name) == 0 or file_name[0] == "":
         return
     QApplication.setOverrideCursor(Qt.WaitCursor)
-    question_groups = []
-    questions = []
-    for question_group in db.get_all_question_groups():
-        question_groups += [question_group.export()]
-    for question in db.get_all_questions():
-        questions += [question.export()]
-    with open(file_name[0], "w+") as file:
-        json.dump({
-            "question_groups": question_groups,
-            "questions": questions
-        }, file)
+    if file_name[1] == snapshot_filter:
+        db.export_snapshot(file_name[0])
+    else:
+        # the window stays responsive, but the modal dialog keeps e.g. an import from closing the session while
+        # iter_all_questions is still reading
+        progress_dialog = QProgressDialog("Exportiere Fragen...", None, 0, 0, parent)
+        progress_dialog.setWindowTitle("Export")
+        progress_dialog.setWindowModality(Qt.ApplicationModal)
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.show()
+        try:
+            with open(file_name[0], "w+") as file:
+                write_sr_regeltest_de(file, db.get_all_question_groups(), db.iter_all_questions(),
+                                      progress=QApplication.processEvents)
+        finally:
+            progress_dialog.close()
     QApplication.restoreOverrideCursor()
 
 
+class UpdateCheckWorker(QThread):
+    # (stable, dev) release info as returned by check_for_update
+    result = Signal(object)
+
+    def __init__(self, parent: QWidget, force: bool = False):
+        super(UpdateCheckWorker, self).__init__(parent)
+        self.force = force
+
+    def run(self):
+        try:
+            releases = check_for_update(force=self.force)
+        except Exception as err:
+            logging.warning(f"Update check failed: {err}")
+            releases = (None, None)
+        if not self.isInterruptionRequested():
+            self.result.emit(releases)
+
+
 def display_update_dialog(parent, releases):
     # new_version, description, url, download_url
+    from src.updater import UpdateChecker
+
     dialog = UpdateChecker(parent, releases, app_version.is_devrelease)
     dialog.exec()
 
@@ -163,6 +332,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.question_overview = QuestionOverviewWidget(self)
         self.ui.stackedWidget.addWidget(self.question_overview)
+        # the question tables cache their values -> refresh the usage counts after archiving a regeltest
+        self.question_overview_dock.regeltest_archived.connect(self.question_overview.reset)
 
         self.self_test = SelfTestWidget(self, self.self_test_dock)
         self.ui.stackedWidget.addWidget(self.self_test)
@@ -171,7 +342,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.setWindowTitle(QCoreApplication.translate("MainWindow", f"{display_name} - {app_version}", None))
         self.ui.actionAus_einer_Datei.triggered.connect(lambda: self.load_dataset(from_file=True))
         self.ui.actionAus_dem_Internet.triggered.connect(lambda: self.load_dataset(from_file=False))
-        self.ui.actionAuf_Updates_pr_fen.triggered.connect(lambda: display_update_dialog(self, check_for_update()))
+        self.ui.actionAuf_Updates_pr_fen.triggered.connect(lambda: self.check_for_update(manual=True))
         self.ui.action_ber.triggered.connect(about_dialog)
 
         # self.ui.menuBearbeiten.setEnabled()
@@ -185,15 +356,38 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.ui.actionBisherige_Regeltests.triggered.connect(self.previous_regeltests)
 
+        self.update_workers = []  # type: List[UpdateCheckWorker]
+
     def show(self) -> None:
         super(MainWindow, self).show()
         if not is_bundled:
             return
-        releases = check_for_update()
+        self.check_for_update()
+
+    def check_for_update(self, manual: bool = False):
+        # runs in the background, a manual check always shows the result and ignores the cache age
+        worker = UpdateCheckWorker(self, force=manual)
+        worker.result.connect(lambda releases: self.update_check_finished(releases, manual))
+        worker.finished.connect(lambda: self.update_workers.remove(worker))
+        worker.finished.connect(worker.deleteLater)
+        self.update_workers.append(worker)
+        worker.start()
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        # the workers are children of the window and Qt aborts if a running QThread is destroyed. A blocked request
+        # cannot be cancelled, so the window is hidden while waiting for it (up to the request timeouts)
+        self.hide()
+        for worker in self.update_workers:
+            worker.requestInterruption()
+        for worker in self.update_workers:
+            worker.wait()
+        super(MainWindow, self).closeEvent(event)
+
+    def update_check_finished(self, releases, manual: bool):
         update_available = False
         if (app_version.is_devrelease and releases[1]) or (not app_version.is_devrelease and releases[0]):
             update_available = True
-        if update_available:
+        if update_available or manual:
             display_update_dialog(self, releases)
 
     def initialize(self):
@@ -224,6 +418,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if self.ui.stackedWidget.currentIndex() == int(mode) and not reset:
             return
 
+        if self.ui.stackedWidget.currentIndex() == int(ApplicationMode.self_test) and \
+                mode == ApplicationMode.question_overview:
+            # statistics were updated during the self test -> refresh the cached question tables
+            self.question_overview.reset()
+
         self.ui.stackedWidget.setCurrentIndex(int(mode))
         self.ui.stacked_widget_dock.setCurrentIndex(int(mode))
 
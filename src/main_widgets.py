@@ -1,15 +1,17 @@
 from __future__ import annotations
 
 import datetime
+import time
+from dataclasses import dataclass
 from enum import Enum, auto
-from typing import List, Tuple, Dict
+from typing import List, Dict
 from typing import TYPE_CHECKING, Optional
 
-from PySide6.QtCore import Signal, QSortFilterProxyModel, QTimer
+from PySide6.QtCore import Signal, QTimer, QModelIndex
 from PySide6.QtGui import QKeySequence, QShortcut, Qt
 from PySide6.QtWidgets import QWidget, QListView, QMessageBox, QDialog, QDialogButtonBox, QListWidgetItem, \
-    QTreeWidgetItem, QTableWidget, QGridLayout, QTableWidgetItem, QStyle
-from sqlalchemy import func, nullsfirst, or_
+    QTreeWidgetItem, QTableWidget, QGridLayout, QTableWidgetItem, QStyle, QVBoxLayout
+from sqlalchemy import nullsfirst, or_
 
 from src import main_application
 from src.database import db
@@ -58,7 +60,61 @@ class QuestionGroupEditor(QDialog, Ui_QuestionGroupEditor):
         self.ui.question_group_name.setText(value)
 
 
+@dataclass
+class QuestionGroupTab:
+    """
+    Tab of a question group. The table is only created once the tab is shown (hydrated) and is released again if
+    the tab was not used for a while, until then the tab widget is an empty placeholder.
+    """
+    question_group: QuestionGroup
+    widget: QWidget
+    view: Optional[QuestionGroupTableView] = None
+    filter_model: Optional[RuleSortFilterProxyModel] = None
+    model: Optional[QuestionGroupDataModel] = None
+    last_used: float = 0
+
+    @property
+    def hydrated(self) -> bool:
+        return self.model is not None
+
+    def hydrate(self):
+        self.last_used = time.monotonic()
+        if self.hydrated:
+            return
+        self.view = QuestionGroupTableView(self.widget)
+        self.model = QuestionGroupDataModel(self.question_group, self.view)
+        self.filter_model = RuleSortFilterProxyModel(self.view)
+        self.filter_model.setSourceModel(self.model)
+        self.view.setModel(self.filter_model)
+        self.view.sortByColumn(0, Qt.AscendingOrder)
+        self.widget.layout().addWidget(self.view)
+
+    def select_question(self, signature: str):
+        # fetches pages until the question is loaded
+        self.hydrate()
+        while signature not in (question.signature for question in self.model.questions):
+            if not self.model.canFetchMore(QModelIndex()):
+                return
+            self.model.fetchMore(QModelIndex())
+        row = [question.signature for question in self.model.questions].index(signature)
+        index = self.filter_model.mapFromSource(self.model.index(row, 0))
+        self.view.selectRow(index.row())
+        self.view.scrollTo(index)
+
+    def release(self):
+        if not self.hydrated:
+            return
+        # model and filter model are children of the view
+        self.widget.layout().removeWidget(self.view)
+        self.view.deleteLater()
+        self.view = self.filter_model = self.model = None
+
+
 class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
+    prefetch_delay = 250  # ms after a tab change before the neighbouring tabs are hydrated
+    release_check_interval = 60 * 1000  # ms
+    release_after = 5 * 60  # s a tab has to be unused before its table is released
+
     def __init__(self, main_window: MainWindow):
         super(QuestionOverviewWidget, self).__init__(main_window)
         self.ui = Ui_QuestionOverviewWidget()
@@ -86,11 +142,56 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
         self.ui.filter_list.itemDoubleClicked.connect(self.add_filter)
         self.ui.add_filter.clicked.connect(self.add_filter)
 
-        self.question_group_tabs = []  # type: List[Tuple[QuestionGroup, QSortFilterProxyModel, QuestionGroupDataModel]]
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.ui.search_field.textChanged.connect(lambda _: self.search_timer.start())
+
+        self.question_group_tabs = []  # type: List[QuestionGroupTab]
         self.questions = {}  # type: Dict[QTreeWidgetItem, str]
 
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(self.prefetch_delay)
+        self.prefetch_timer.timeout.connect(self.prefetch_neighbour_tabs)
+        self.release_timer = QTimer(self)
+        self.release_timer.setInterval(self.release_check_interval)
+        self.release_timer.timeout.connect(self.release_idle_tabs)
+        self.release_timer.start()
+
         self.old_index = self.ui.tabWidget.currentIndex()
         self.ui.tabWidget.currentChanged.connect(self.handle_bad_scrolling)
+        self.ui.tabWidget.currentChanged.connect(self.activate_tab)
+
+    def activate_tab(self, index: int):
+        if not 0 <= index < len(self.question_group_tabs):
+            return
+        self.question_group_tabs[index].hydrate()
+        self.prefetch_timer.start()
+
+    def _neighbour_tabs(self, index: int) -> List[int]:
+        # closest visible tab on either side
+        neighbours = []
+        for indexes in (range(index - 1, -1, -1), range(index + 1, len(self.question_group_tabs))):
+            for i in indexes:
+                if self.ui.tabWidget.isTabVisible(i):
+                    neighbours.append(i)
+                    break
+        return neighbours
+
+    def prefetch_neighbour_tabs(self):
+        # runs once the current tab is shown, so switching to the next tab is instant
+        for index in self._neighbour_tabs(self.ui.tabWidget.currentIndex()):
+            self.question_group_tabs[index].hydrate()
+
+    def release_idle_tabs(self):
+        current_index = self.ui.tabWidget.currentIndex()
+        keep = {current_index, *self._neighbour_tabs(current_index)}
+        now = time.monotonic()
+        for index, tab in enumerate(self.question_group_tabs):
+            if index not in keep and tab.hydrated and now - tab.last_used > self.release_after:
+                tab.release()
 
     def handle_bad_scrolling(self, new_index: int):
         if not self.ui.tabWidget.isTabVisible(new_index):
@@ -137,25 +238,21 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
         msgBox.setDefaultButton(QMessageBox.Cancel)
         ret = msgBox.exec()
         if ret == QMessageBox.Yes:
-            question_group, _, _ = self.question_group_tabs[index_tabwidget]
-            self.question_group_tabs.pop(index_tabwidget)
-            db.delete(question_group)
+            tab = self.question_group_tabs.pop(index_tabwidget)
+            db.delete(tab.question_group)
             self.ui.tabWidget.removeTab(index_tabwidget)
+            tab.widget.deleteLater()
 
         if not self.question_group_tabs:
             self.main_window.initialize()
 
     def create_question_group_tab(self, question_group: QuestionGroup):
-        tab = QWidget()
-        view = QuestionGroupTableView(tab)
-        model = QuestionGroupDataModel(question_group, view)
-        filter_model = RuleSortFilterProxyModel()
-        filter_model.setSourceModel(model)
-        view.setModel(filter_model)
-        view.sortByColumn(0, Qt.AscendingOrder)
-        self.question_group_tabs.append((question_group, filter_model, model))
-        self.ui.tabWidget.addTab(tab, "")
-        self._update_tabtitle(self.ui.tabWidget.indexOf(tab))
+        # placeholder, the table is created by activate_tab (adding the first tab already makes it the current one)
+        widget = QWidget()
+        QVBoxLayout(widget)
+        self.question_group_tabs.append(QuestionGroupTab(question_group, widget))
+        self.ui.tabWidget.addTab(widget, "")
+        self._update_tabtitle(self.ui.tabWidget.indexOf(widget))
 
     def _question_group_editor(self, question_group: QuestionGroup | None,
                                editor: QuestionGroupEditor) -> EditorResult:
@@ -174,7 +271,7 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
     def rename_question_group(self, index):
         if not self.question_group_tabs:
             return
-        question_group, _, _ = self.question_group_tabs[index]
+        question_group = self.question_group_tabs[index].question_group
         editor = QuestionGroupEditor(id=question_group.id, name=question_group.name)
         result = self._question_group_editor(question_group, editor)
         while result == EditorResult.Invalid:
@@ -201,7 +298,7 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
             self.create_question_group_tab(question_group)
 
     def _update_tabtitle(self, index):
-        question_group, _, _ = self.question_group_tabs[index]
+        question_group = self.question_group_tabs[index].question_group
         self.ui.tabWidget.setTabText(index, f"{question_group.id:02d} {question_group.name}")
 
     def add_filter(self, list_entry: QListWidgetItem | bool = False):
@@ -212,7 +309,7 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
         else:
             # Edit mode -> Doubleclick on existing entry!
             index = self.ui.filter_list.indexFromItem(list_entry).row()
-            current_configuration = RuleSortFilterProxyModel.filters[index][1]
+            current_configuration = RuleSortFilterProxyModel.filters[index]
             edit_mode = True
         properties = {}
         for name, visible in QuestionGroupDataModel.headers:
@@ -231,12 +328,11 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
             # Closed via Save
             dict_key, filter_option, filter_value = editor.current_configuration()
             if not edit_mode:
-                RuleSortFilterProxyModel.filters += [(editor.create_filter(), (dict_key, filter_option, filter_value))]
+                RuleSortFilterProxyModel.filters += [(dict_key, filter_option, filter_value)]
                 self.ui.filter_list.addItem(
                     QListWidgetItem(f"{properties[dict_key].table_header} {filter_option} '{filter_value}'"))
             else:
-                RuleSortFilterProxyModel.filters[index] = (
-                    editor.create_filter(), (dict_key, filter_option, filter_value))
+                RuleSortFilterProxyModel.filters[index] = (dict_key, filter_option, filter_value)
                 list_entry.setText(f"{properties[dict_key].table_header} {filter_option} '{filter_value}'")
         elif editor.result == QDialogButtonBox.ButtonRole.RejectRole:
             # Closed via Cancel
@@ -248,11 +344,33 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
             raise ValueError(f"Invalid response {editor.result}")
         self.refresh_column_filter()
 
+    def apply_search(self):
+        RuleSortFilterProxyModel.search = self.ui.search_field.text().strip()
+        self.refresh_column_filter()
+        if RuleSortFilterProxyModel.search:
+            self.select_best_match()
+
+    def select_best_match(self):
+        # the tables keep their sort order, the best ranked question passing the filters is selected
+        accepted_signatures = RuleSortFilterProxyModel.accepted_signatures
+        for question in db.search_questions(RuleSortFilterProxyModel.search):
+            if question.signature not in accepted_signatures.get(question.group_id, ()):
+                continue
+            for index, tab in enumerate(self.question_group_tabs):
+                if tab.question_group.id == question.group_id:
+                    self.ui.tabWidget.setCurrentIndex(index)
+                    tab.select_question(question.signature)
+                    return
+
     def refresh_column_filter(self):
-        for index, (_, filter_model, _) in enumerate(self.question_group_tabs):
-            filter_model = filter_model  # type: RuleSortFilterProxyModel
-            filter_model.invalidateFilter()
-            self.ui.tabWidget.setTabVisible(index, filter_model.rowCount() != 0)
+        RuleSortFilterProxyModel.update_filter_result()
+        accepted_signatures = RuleSortFilterProxyModel.accepted_signatures
+        for index, tab in enumerate(self.question_group_tabs):
+            if tab.hydrated:
+                # the model fetches the matching rows
+                tab.model.reset()
+            self.ui.tabWidget.setTabVisible(index, accepted_signatures is None or
+                                            bool(accepted_signatures.get(tab.question_group.id)))
 
     def create_ruletabs(self, question_groups: List[QuestionGroup]):
         self.ui.tabWidget.setTabsClosable(True)
@@ -261,8 +379,10 @@ class QuestionOverviewWidget(QWidget, Ui_QuestionOverviewWidget):
             self.create_question_group_tab(question_group)
 
     def reset(self):
-        for (_, _, model) in self.question_group_tabs:
-            model.reset()
+        # released tabs read fresh data once they are shown again
+        for tab in self.question_group_tabs:
+            if tab.hydrated:
+                tab.model.reset()
 
 
 class FirstSetupWidget(QWidget, Ui_FirstSetupWidget):
@@ -508,14 +628,14 @@ class SelfTestWidget(QWidget, Ui_SelfTestWidget):
         self.ui.stackedWidget.setCurrentIndex(0)
 
     def selected_groups_changed(self):
-        questions = db.get_questions_by_foreignkey(self.dock_widget.get_question_groups(), as_query=True)
+        question_groups = self.dock_widget.get_question_groups()
 
         if self.dock_widget.mode == SelfTestMode.random:
-            questions = self.prepare_random_mode(questions)
+            questions = db.sample_questions(question_groups)
         elif self.dock_widget.mode == SelfTestMode.level:
-            questions = self.prepare_level_mode(questions)
+            questions = self.prepare_level_mode(db.get_questions_by_foreignkey(question_groups, as_query=True))
         elif self.dock_widget.mode == SelfTestMode.prioritize_new:
-            questions = self.prepare_prioritize_new(questions)
+            questions = self.prepare_prioritize_new(db.get_questions_by_foreignkey(question_groups, as_query=True))
         else:
             raise ValueError("Not supported mode.")
 
@@ -571,11 +691,6 @@ class SelfTestWidget(QWidget, Ui_SelfTestWidget):
             self.start_timer()
         self.init_timer_display()
 
-    @staticmethod
-    def prepare_random_mode(dataset) -> List[Question]:
-        dataset = dataset.order_by(func.random())
-        return dataset.all()
-
     @staticmethod
     def prepare_level_mode(dataset) -> List[Question]:
         levels_to_days = [0, 1, 3, 9, 29, 90]
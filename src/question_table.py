@@ -1,16 +1,16 @@
 from __future__ import annotations
 
 import datetime
-from typing import Any, List
+from typing import Any, List, Dict, Optional, Set, Tuple
 
 import PySide6
-from PySide6.QtCore import Qt, QPoint, QAbstractTableModel, QSortFilterProxyModel
+from PySide6.QtCore import Qt, QPoint, QAbstractTableModel, QSortFilterProxyModel, QModelIndex
 from PySide6.QtGui import QAction, QDrag, QShortcut, QKeySequence
-from PySide6.QtWidgets import QTreeWidget, QVBoxLayout, QDialog, QMessageBox, QMenu, QListView, QTableView, \
+from PySide6.QtWidgets import QTreeWidget, QDialog, QMessageBox, QMenu, QListView, QTableView, \
     QStyledItemDelegate, QWidget
 
 from src.database import db
-from src.datatypes import Question
+from src.datatypes import Question, FilterOption
 from src.question_editor import QuestionEditor
 
 dict_key = str
@@ -45,20 +45,89 @@ class QuestionGroupDataModel(QAbstractTableModel):
                ('streak', False)]
     activated_headers = [question for (question, question_bool) in headers if question_bool]
 
+    page_size = 200  # rows fetched at once, the view fetches more while scrolling down
+
     def __init__(self, question_group, parent):
         super(QuestionGroupDataModel, self).__init__(parent)
         self.question_group = question_group
         self.questions = []  # type: List[Question]
+        self.row_cache = []  # type: List[Dict[dict_key, Question.QuestionValues]]
+        # rows are sorted in SQL and fetched page by page
+        self.sort_key = 'question_id'  # type: dict_key
+        self.sort_order = Qt.AscendingOrder
+        self.position = None  # type: Optional[tuple]  # keyset position of the last fetched row
+        self.all_fetched = False
+        self.created_signatures = set()  # type: Set[str]
         self.read_data()
 
-    def read_data(self):
-        self.questions = db.get_questions_by_foreignkey([self.question_group])
+    def read_data(self, minimum_rows: int = 0):
+        # loads the first page, or at least minimum_rows rows
+        self.questions = []
+        self.row_cache = []
+        self.position = None
+        self.all_fetched = False
+        self.created_signatures = set()
+        self._append_rows(self._fetch_page(max(minimum_rows, self.page_size)))
+
+    def _fetch_page(self, limit: int) -> List[Tuple[Question, int]]:
+        # only matching rows are fetched, otherwise the view could stop fetching before reaching them
+        rows = db.get_question_table_page(self.question_group, self.sort_key,
+                                          self.sort_order == Qt.DescendingOrder, self.position, limit,
+                                          RuleSortFilterProxyModel.filters, RuleSortFilterProxyModel.search)
+        self.all_fetched = len(rows) < limit
+        if rows:
+            self.position = rows[-1][2]
+        # questions created in this table were appended already
+        return [(question, regeltest_count) for question, regeltest_count, _ in rows
+                if question.signature not in self.created_signatures]
+
+    def _append_rows(self, rows: List[Tuple[Question, int]]):
+        self.questions += [question for question, _ in rows]
+        self.row_cache += [self.cache_row(question, regeltest_count) for question, regeltest_count in rows]
+
+    def canFetchMore(self, parent: PySide6.QtCore.QModelIndex | PySide6.QtCore.QPersistentModelIndex) -> bool:
+        return not parent.isValid() and not self.all_fetched
+
+    def fetchMore(self, parent: PySide6.QtCore.QModelIndex | PySide6.QtCore.QPersistentModelIndex) -> None:
+        if not self.canFetchMore(parent):
+            return
+        rows = self._fetch_page(self.page_size)
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.questions), len(self.questions) + len(rows) - 1)
+        self._append_rows(rows)
+        self.endInsertRows()
 
-    def reset(self) -> None:
+    def sort(self, column: int, order: PySide6.QtCore.Qt.SortOrder = Qt.AscendingOrder) -> None:
+        sort_key = QuestionGroupDataModel.activated_headers[column] if column >= 0 else 'question_id'
+        if sort_key == self.sort_key and order == self.sort_order:
+            return
+        self.sort_key = sort_key
+        self.sort_order = order
+        # starts over with the first page in the new order
         self.beginResetModel()
         self.read_data()
         self.endResetModel()
 
+    @staticmethod
+    def cache_row(question: Question, regeltest_count: Optional[int] = None) \
+            -> Dict[dict_key, Question.QuestionValues]:
+        # display, tooltip and checkbox values of all columns, already converted for the view (display is sorted on)
+        cached = {}
+        for key, values in question.table_values(regeltest_count).items():
+            value = values.table_value
+            if type(value) == datetime.date or type(value) == datetime.datetime:
+                value = str(value)
+            cached[key] = Question.QuestionValues(table_value=value, table_tooltip=str(values.table_tooltip),
+                                                  table_checkbox=values.table_checkbox)
+        return cached
+
+    def reset(self) -> None:
+        # reloads as many rows as were fetched, the view keeps its scroll position
+        self.beginResetModel()
+        self.read_data(len(self.questions))
+        self.endResetModel()
+
     def rowCount(self, parent: PySide6.QtCore.QModelIndex | PySide6.QtCore.QPersistentModelIndex = ...) -> int:
         return len(self.questions)
 
@@ -126,23 +195,23 @@ class QuestionGroupDataModel(QAbstractTableModel):
         if role != Qt.CheckStateRole and role != Qt.DisplayRole and role != Qt.ToolTipRole:
             return None
 
+        values = self.row_cache[row][QuestionGroupDataModel.activated_headers[col]]
         if role == Qt.CheckStateRole:
-            checkbox = self.questions[row].values(QuestionGroupDataModel.activated_headers[col]).table_checkbox
-            return checkbox
+            return values.table_checkbox
         elif role == Qt.DisplayRole:
-            value = self.questions[row].values(QuestionGroupDataModel.activated_headers[col]).table_value
-            if type(value) == datetime.date or type(value) == datetime.datetime:
-                value = str(value)
-            return value
+            return values.table_value
         elif role == Qt.ToolTipRole:
-            tooltip = str(self.questions[row].values(QuestionGroupDataModel.activated_headers[col]).table_tooltip)
-            return tooltip
+            return values.table_tooltip
 
     def setData(self, index: PySide6.QtCore.QModelIndex | PySide6.QtCore.QPersistentModelIndex, value: Any,
                 role: int = ...) -> bool:
         if role == Qt.UserRole:
             db.add_object(value)
-            self.questions[index.row()] = value
+            row = index.row()
+            self.questions[row] = value
+            self.row_cache[row] = self.cache_row(value, self.row_cache[row]['regeltest_count'].table_value)
+            RuleSortFilterProxyModel.update_filter_result()
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
             return True
         return False
 
@@ -183,6 +252,7 @@ class QuestionGroupDataModel(QAbstractTableModel):
                   parent: PySide6.QtCore.QModelIndex | PySide6.QtCore.QPersistentModelIndex = ...) -> bool:
         db.delete(self.questions[row])
         self.questions.pop(row)
+        self.row_cache.pop(row)
         return True
 
     def insertRow(self, row: int,
@@ -194,6 +264,10 @@ class QuestionGroupDataModel(QAbstractTableModel):
         if editor.exec() == QDialog.Accepted:
             db.add_object(editor.question)
             self.questions.insert(row, editor.question)
+            self.row_cache.insert(row, self.cache_row(editor.question, 0))
+            if not self.all_fetched:
+                self.created_signatures.add(editor.question.signature)
+            RuleSortFilterProxyModel.update_filter_result()
             return True
         else:
             db.abort()
@@ -250,9 +324,6 @@ class QuestionGroupTableView(QTableView):
         force_delete_shortcut = QShortcut(QKeySequence(Qt.SHIFT + Qt.Key_Delete), self, None, None, Qt.WidgetShortcut)
         force_delete_shortcut.activated.connect(lambda: self.delete_selected_items(False))
 
-        vertical_layout = QVBoxLayout(parent)
-        vertical_layout.addWidget(self)
-
     def delete_selected_items(self, ask_for_confirmation=True):
         selection_model = self.selectionModel()
         if not selection_model.hasSelection():
@@ -323,15 +394,30 @@ class QuestionGroupTableView(QTableView):
 
 
 class RuleSortFilterProxyModel(QSortFilterProxyModel):
-    filters = []  # List[Tuple[Tuple[dict_key, Callable], Tuple[str, FilterOption, Any]]]
+    filters = []  # type: List[Tuple[dict_key, FilterOption, Any]]
+    search = ""
+    # signatures matching all filters per question group id, None if no filter is active
+    accepted_signatures = None  # type: Optional[Dict[int, Set[str]]]
+
+    @staticmethod
+    def update_filter_result():
+        # evaluates the filters and the search once in SQL for all question groups
+        if RuleSortFilterProxyModel.filters or RuleSortFilterProxyModel.search:
+            RuleSortFilterProxyModel.accepted_signatures = db.get_filtered_signatures(
+                RuleSortFilterProxyModel.filters, RuleSortFilterProxyModel.search)
+        else:
+            RuleSortFilterProxyModel.accepted_signatures = None
 
     def filterAcceptsRow(self, source_row: int, source_parent: PySide6.QtCore.QModelIndex |
                                                                PySide6.QtCore.QPersistentModelIndex) -> bool:
-        if not RuleSortFilterProxyModel.filters:
+        accepted_signatures = RuleSortFilterProxyModel.accepted_signatures
+        if accepted_signatures is None:
             return True
 
-        cur_question = self.sourceModel().data(source_row, Qt.UserRole)
-        answer = True
-        for ((target, filter_function), _) in RuleSortFilterProxyModel.filters:
-            answer = answer & filter_function(cur_question.values(target).table_value)
-        return answer
+        source_model = self.sourceModel()  # type: QuestionGroupDataModel
+        signatures = accepted_signatures.get(source_model.question_group.id, ())
+        return source_model.questions[source_row].signature in signatures
+
+    def sort(self, column: int, order: PySide6.QtCore.Qt.SortOrder = Qt.AscendingOrder) -> None:
+        # the source model sorts in SQL, sorting only its fetched rows here would mix up the pages
+        self.sourceModel().sort(column, order)
@@ -76,4 +76,4 @@ class PreviousRegeltests(QDialog, Ui_RegeltestArchiveDialog):
             return []
         else:
             regeltest = self.regeltests[items[0].row()]
-        return [question.question for question in regeltest.selected_questions]
+        return db.get_questions_by_signatures(str(question.question_id) for question in regeltest.selected_questions)
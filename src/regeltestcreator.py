@@ -1,5 +1,5 @@
 import random
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 
 from PySide6.QtCore import Qt, Signal, QPoint
 from PySide6.QtGui import QShortcut, QKeySequence, QAction
@@ -74,8 +74,8 @@ class RegeltestCreator(QListWidget):
             signatures = data.data().decode()
             n = 32
             signatures = [signatures[i:i + n] for i in range(0, len(signatures), n)]
-            for signature in signatures:
-                self.add_question(db.get_question(signature))
+            for question in db.get_questions_by_signatures(signatures):
+                self.add_question(question)
 
 
 class QuestionEditWidget(QWidget, Ui_RegeltestCreatorQuestionWidget):
@@ -265,24 +265,23 @@ class RegeltestSetup(QDialog, Ui_RegeltestSetup):
             self.question_group_widgets += [question_group]
         layout.addItem(QSpacerItem(20, 257, QSizePolicy.Minimum, QSizePolicy.Expanding))
 
-    def collect_questions(self):
+    def collect_questions(self, seed: Optional[int] = None):
+        # a seed makes the selection (and its order) reproducible
+        rng = random.Random(seed)
         questions = []
         for question_group_widget in self.question_group_widgets:
             question_group, text, mchoice = question_group_widget.get_parameters()
             text_questions = []
             mchoice_questions = []
             if text:
-                text_questions = db.get_questions_by_foreignkey([question_group], mchoice=False,
-                                                                randomize=True)[
-                                 0:text]
+                text_questions = db.sample_questions([question_group], text, mchoice=False, seed=rng.getrandbits(32))
             if mchoice:
-                mchoice_questions = db.get_questions_by_foreignkey([question_group], mchoice=True,
-                                                                   randomize=True)[
-                                    0:mchoice]
+                mchoice_questions = db.sample_questions([question_group], mchoice, mchoice=True,
+                                                        seed=rng.getrandbits(32))
             text_questions += mchoice_questions
             if self.ui.checkbox_textmchoice.isChecked():
-                random.shuffle(text_questions)
+                rng.shuffle(text_questions)
             questions += text_questions
         if self.ui.checkbox_question_groups.isChecked():
-            random.shuffle(questions)
+            rng.shuffle(questions)
         return questions
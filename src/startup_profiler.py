@@ -0,0 +1,54 @@
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Tuple, Dict, Iterator
+
+
+class StartupProfiler:
+    """
+    Breakdown of the startup time, enabled with --profile-startup.
+
+    Import times are measured by wrapping builtins.__import__ and are inclusive, i.e. a module's time contains the
+    imports it triggers itself. Phases are measured with the phase context manager.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []  # type: List[Tuple[str, float]]
+        self.imports = {}  # type: Dict[str, float]
+        self._original_import = builtins.__import__
+        if enabled:
+            builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.imports.setdefault(name, time.perf_counter() - start)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, import_count: int = 20):
+        if not self.enabled:
+            return
+        builtins.__import__ = self._original_import
+        lines = [f"Startup took {(time.perf_counter() - self.start) * 1000:.0f} ms", "", "Phases:"]
+        lines += [f"  {duration * 1000:8.1f} ms  {name}" for name, duration in self.phases]
+        lines += ["", f"Slowest imports (inclusive, top {import_count}):"]
+        slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:import_count]
+        lines += [f"  {duration * 1000:8.1f} ms  {name}" for name, duration in slowest]
+        # pythonw has no console
+        if sys.stderr:
+            print("\n".join(lines), file=sys.stderr)
@@ -9,14 +9,14 @@
 ################################################################################
 
 from PySide6.QtCore import (QCoreApplication, QMetaObject, Qt)
-from PySide6.QtWidgets import (QComboBox, QDialogButtonBox, QGridLayout, QLabel, QLineEdit)
+from PySide6.QtWidgets import (QCheckBox, QComboBox, QDialogButtonBox, QGridLayout, QLabel, QLineEdit)
 
 
 class Ui_DownloadDialog(object):
     def setupUi(self, DownloadDialog):
         if not DownloadDialog.objectName():
             DownloadDialog.setObjectName(u"DownloadDialog")
-        DownloadDialog.resize(342, 141)
+        DownloadDialog.resize(342, 165)
         self.gridLayout = QGridLayout(DownloadDialog)
         self.gridLayout.setObjectName(u"gridLayout")
         self.password_label = QLabel(DownloadDialog)
@@ -47,11 +47,16 @@ class Ui_DownloadDialog(object):
 
         self.gridLayout.addWidget(self.username_label, 1, 0, 1, 1)
 
+        self.incremental_checkbox = QCheckBox(DownloadDialog)
+        self.incremental_checkbox.setObjectName(u"incremental_checkbox")
+
+        self.gridLayout.addWidget(self.incremental_checkbox, 3, 0, 1, 2)
+
         self.buttonBox = QDialogButtonBox(DownloadDialog)
         self.buttonBox.setObjectName(u"buttonBox")
         self.buttonBox.setStandardButtons(QDialogButtonBox.Cancel | QDialogButtonBox.Ok)
 
-        self.gridLayout.addWidget(self.buttonBox, 3, 0, 1, 2)
+        self.gridLayout.addWidget(self.buttonBox, 4, 0, 1, 2)
 
         self.retranslateUi(DownloadDialog)
         self.buttonBox.rejected.connect(DownloadDialog.reject)
@@ -65,4 +70,6 @@ class Ui_DownloadDialog(object):
         self.password_label.setText(QCoreApplication.translate("DownloadDialog", u"Password", None))
         self.username_lineedit.setText("")
         self.username_label.setText(QCoreApplication.translate("DownloadDialog", u"Username", None))
+        self.incremental_checkbox.setText(
+            QCoreApplication.translate("DownloadDialog", u"Nur neue und ge\u00e4nderte Fragen laden", None))
     # retranslateUi
@@ -9,7 +9,7 @@
 ################################################################################
 
 from PySide6.QtCore import (QCoreApplication, QMetaObject, Qt)
-from PySide6.QtWidgets import (QFrame, QHBoxLayout, QListView, QListWidget, QPushButton,
+from PySide6.QtWidgets import (QFrame, QHBoxLayout, QLineEdit, QListView, QListWidget, QPushButton,
                                QSizePolicy, QTabWidget, QTreeWidget, QTreeWidgetItem,
                                QVBoxLayout, QWidget)
 
@@ -54,6 +54,12 @@ class Ui_QuestionOverviewWidget(object):
         self.widget_3.setObjectName(u"widget_3")
         self.verticalLayout_4 = QVBoxLayout(self.widget_3)
         self.verticalLayout_4.setObjectName(u"verticalLayout_4")
+        self.search_field = QLineEdit(self.widget_3)
+        self.search_field.setObjectName(u"search_field")
+        self.search_field.setClearButtonEnabled(True)
+
+        self.verticalLayout_4.addWidget(self.search_field)
+
         self.add_filter = QPushButton(self.widget_3)
         self.add_filter.setObjectName(u"add_filter")
 
@@ -98,6 +104,7 @@ class Ui_QuestionOverviewWidget(object):
 
     def retranslateUi(self, QuestionOverviewWidget):
         QuestionOverviewWidget.setWindowTitle(QCoreApplication.translate("QuestionOverviewWidget", u"Form", None))
+        self.search_field.setPlaceholderText(QCoreApplication.translate("QuestionOverviewWidget", u"Suche", None))
         self.add_filter.setText(QCoreApplication.translate("QuestionOverviewWidget", u"Neuer Filter", None))
         ___qtreewidgetitem = self.treeWidget.headerItem()
         ___qtreewidgetitem.setText(4,
@@ -1,11 +1,15 @@
+import glob
+import hashlib
 import os
-import shutil
 import subprocess
 import sys
+import time
 from typing import Optional
+from urllib.parse import urlparse
 
 import markdown2
 import requests
+import urllib3
 from PySide6.QtCore import Signal, QThread, Qt
 from PySide6.QtWidgets import QDialog, QMessageBox
 
@@ -31,6 +35,8 @@ class UpdateChecker(QDialog, Ui_UpdateChecker):
         self.ui.text.setOpenExternalLinks(True)
 
         self.download_link = None  # type: Optional[str]
+        self.checksum_link = None  # type: Optional[str]
+        self.download_thread = None  # type: Optional[DownloadThread]
         self.ui.install_update_button.clicked.connect(self.update)
         self.ui.install_update_button.setDisabled(True)
         self.ui.download_progress.setVisible(False)
@@ -51,6 +57,7 @@ class UpdateChecker(QDialog, Ui_UpdateChecker):
         if release[3]:
             download_link = f'<a href="{release[3]}">Neueste Version jetzt herunterladen</a>'
             self.download_link = release[3]
+            self.checksum_link = release[4]
             if is_bundled:
                 self.ui.install_update_button.setDisabled(False)
         else:
@@ -64,29 +71,12 @@ class UpdateChecker(QDialog, Ui_UpdateChecker):
                              f'{release_notes}{download_link}')
 
     def update(self) -> None:
-        def progressbar_tracking(value):
-            self.ui.download_progress.setValue(value)
-            if value != 100:
-                return
-
-            info_box = QMessageBox(self)
-            info_box.setWindowTitle("Update erfolgreich heruntergeladen!")
-            info_box.setText("Die Installation dauert ca. 15 Sekunden.")
-            info_box.setInformativeText("Dabei wird die Applikation beendet und nach "
-                                        "erfolgreichem Update erneut gestartet.")
-            info_box.exec()
-            subprocess.Popen([download_path, sys.executable, str(os.getpid())])
-            sys.exit(0)
-
         if not self.download_link:
             return
 
         self.ui.download_progress.setVisible(True)
-
-        if os.path.isdir(app_dirs.user_cache_dir):
-            shutil.rmtree(app_dirs.user_cache_dir, ignore_errors=True)
-        if not os.path.isdir(app_dirs.user_cache_dir):
-            os.makedirs(app_dirs.user_cache_dir)
+        self.ui.install_update_button.setDisabled(True)
+        os.makedirs(app_dirs.user_cache_dir, exist_ok=True)
 
         executable_name = "RegeltestCreator"
 
@@ -97,41 +87,166 @@ class UpdateChecker(QDialog, Ui_UpdateChecker):
 
         download_path = os.path.join(app_dirs.user_cache_dir, executable_name)
 
-        request = requests.get(self.download_link, stream=True)
-        filesize = request.headers['Content-Length']
+        self.download_thread = DownloadThread(self.download_link, download_path, self.checksum_link, self)
+        self.download_thread.download_progress.connect(self.ui.download_progress.setValue)
+        self.download_thread.download_finished.connect(self.install)
+        self.download_thread.download_failed.connect(self.download_failed)
+        self.download_thread.start()
+
+    def install(self, download_path: str):
+        self.ui.download_progress.setValue(100)
+        info_box = QMessageBox(self)
+        info_box.setWindowTitle("Update erfolgreich heruntergeladen!")
+        info_box.setText("Die Installation dauert ca. 15 Sekunden.")
+        info_box.setInformativeText("Dabei wird die Applikation beendet und nach "
+                                    "erfolgreichem Update erneut gestartet.")
+        info_box.exec()
+        subprocess.Popen([download_path, sys.executable, str(os.getpid())])
+        sys.exit(0)
 
-        file_handle = open(download_path, 'wb+')
-        downloadThread = DownloadThread(request, filesize, file_handle, buffer=10240)
-        downloadThread.download_progress.connect(progressbar_tracking)
-        downloadThread.run()
+    def download_failed(self, message: str):
+        self.ui.install_update_button.setDisabled(False)
+        QMessageBox(QMessageBox.Icon.Critical, "Fehler", f"Das Update konnte nicht heruntergeladen werden.\n{message}",
+                    parent=self).exec()
+
+    def done(self, result: int):
+        # an interrupted download keeps its partial file and resumes on the next try
+        if self.download_thread is not None and self.download_thread.isRunning():
+            self.download_thread.requestInterruption()
+            self.download_thread.wait()
+        super(UpdateChecker, self).done(result)
+
+
+class DownloadError(Exception):
+    pass
 
 
 class DownloadThread(QThread):
+    """
+    Downloads url to path in the background.
+
+    The data is written to a .part file next to path first, named after the url, so an interrupted download of
+    the same release is resumed with an HTTP Range request. The file is only moved to path once it has the size the
+    server announced and, if checksum_url is given, its SHA-256 matches. The chunk size adapts to the connection speed and the progress (in percent) is emitted
+    at most every progress_interval seconds.
+    """
     download_progress = Signal(int)
+    download_finished = Signal(str)
+    download_failed = Signal(str)
 
-    def __init__(self, request, filesize, fileobj, buffer):
-        super(DownloadThread, self).__init__()
-        self.request = request
-        self.filesize = filesize
-        self.fileobj = fileobj
-        self.buffer = buffer
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 4 * 1024 * 1024
+    progress_interval = 0.1
+    timeout = (10, 60)  # connect, read
+
+    def __init__(self, url: str, path: str, checksum_url: Optional[str] = None, parent=None):
+        super(DownloadThread, self).__init__(parent)
+        self.url = url
+        self.path = path
+        self.checksum_url = checksum_url
+        self.part_path = os.path.join(os.path.dirname(path), os.path.basename(urlparse(url).path) + ".part")
 
     def run(self):
         try:
-            offset = 0
-            for chunk in self.request.iter_content(chunk_size=self.buffer):
-                if not chunk:
-                    break
-                self.fileobj.seek(offset)
-                self.fileobj.write(chunk)
-                offset = offset + len(chunk)
-                download_progress = offset / int(self.filesize) * 100
-                if download_progress != 100:
-                    self.download_progress.emit(int(download_progress))
-
-            self.fileobj.close()
-            self.download_progress.emit(100)
-            self.exit(0)
-
-        except Exception as e:
-            print(e)
+            with requests.Session() as session:
+                expected_checksum = self._expected_checksum(session)
+                digest = self._download(session)
+            if digest is None:
+                # interrupted
+                return
+            if expected_checksum and digest.hexdigest() != expected_checksum:
+                os.remove(self.part_path)
+                self.download_failed.emit("Die Prüfsumme der heruntergeladenen Datei stimmt nicht.")
+                return
+            os.replace(self.part_path, self.path)
+            self.download_finished.emit(self.path)
+        except (requests.RequestException, urllib3.exceptions.HTTPError, OSError, DownloadError) as err:
+            # urllib3 raises e.g. ProtocolError (connection dropped) and ReadTimeoutError while reading the body
+            self.download_failed.emit(str(err))
+
+    def _expected_checksum(self, session: requests.Session) -> Optional[str]:
+        if not self.checksum_url:
+            return None
+        response = session.get(self.checksum_url, timeout=self.timeout)
+        response.raise_for_status()
+        # sha256sum format: "<hex digest>  <file name>"
+        fields = response.text.split()
+        if not fields:
+            raise DownloadError("Die Prüfsumme des Updates ist leer.")
+        return fields[0].lower()
+
+    def _download(self, session: requests.Session):
+        # returns the SHA-256 of the complete file, None if the download was interrupted
+        digest = hashlib.sha256()
+        for stale_part in glob.glob(os.path.join(os.path.dirname(self.part_path), "*.part")):
+            if stale_part != self.part_path:
+                os.remove(stale_part)
+        offset = os.path.getsize(self.part_path) if os.path.isfile(self.part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # partial file is already complete, or does not belong to this release if it is larger
+                filesize = self._content_range_total(response)
+                if filesize and offset != filesize:
+                    os.remove(self.part_path)
+                    raise DownloadError("Der unvollständige Download passt nicht zum Update, bitte erneut versuchen.")
+                self._hash_file(digest)
+                return digest
+            response.raise_for_status()
+            if response.status_code == 206:
+                self._hash_file(digest)
+                mode = 'ab'
+                filesize = self._content_range_total(response)
+            else:
+                # server ignored the range -> start over
+                offset = 0
+                mode = 'wb'
+                filesize = int(response.headers.get('Content-Length', 0))
+            if response.headers.get('Content-Encoding', 'identity') != 'identity':
+                # Content-Length counts the encoded bytes
+                filesize = 0
+            response.raw.decode_content = True
+
+            chunk_size = self.min_chunk_size
+            last_progress = 0
+            with open(self.part_path, mode) as file:
+                while not self.isInterruptionRequested():
+                    start = time.perf_counter()
+                    chunk = response.raw.read(chunk_size)
+                    if not chunk:
+                        break
+                    file.write(chunk)
+                    digest.update(chunk)
+                    offset += len(chunk)
+
+                    # aim for roughly one read per progress interval
+                    elapsed = time.perf_counter() - start
+                    if elapsed < self.progress_interval / 2:
+                        chunk_size = min(chunk_size * 2, self.max_chunk_size)
+                    elif elapsed > self.progress_interval * 2:
+                        chunk_size = max(chunk_size // 2, self.min_chunk_size)
+
+                    if filesize and time.perf_counter() - last_progress >= self.progress_interval:
+                        last_progress = time.perf_counter()
+                        self.download_progress.emit(min(int(offset / filesize * 100), 99))
+        if self.isInterruptionRequested():
+            return None
+        self._check_size(offset, filesize)
+        return digest
+
+    @staticmethod
+    def _content_range_total(response: requests.Response) -> int:
+        # "bytes <start>-<end>/<total>" or "bytes */<total>", 0 if the total is unknown
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else 0
+
+    @staticmethod
+    def _check_size(size: int, expected_size: int):
+        # a short file is kept as .part and resumed on the next try
+        if expected_size and size != expected_size:
+            raise DownloadError(f"Die Verbindung wurde nach {size} von {expected_size} Bytes unterbrochen.")
+
+    def _hash_file(self, digest):
+        with open(self.part_path, 'rb') as file:
+            for block in iter(lambda: file.read(self.max_chunk_size), b""):
+                digest.update(block)
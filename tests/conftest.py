@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator, List, Tuple, Type
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src import basic_config
+
+# src.database opens the application database on import, the tests must not touch the user's one
+_data_dir = tempfile.mkdtemp(prefix="regeltestcreator-tests-")
+basic_config.app_dirs = SimpleNamespace(user_data_dir=_data_dir, user_cache_dir=os.path.join(_data_dir, "cache"))
+
+from src.database import DatabaseConnector  # noqa: E402
+from src.datatypes import QuestionGroup, Question, MultipleChoice  # noqa: E402
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_dataset(question_count: int, group_count: int = 5) -> List[QuestionGroup | Question]:
+    # question groups and questions, every third question is multiple choice
+    dataset = [QuestionGroup(id=group_id, name=f"Gruppe {group_id}") for group_id in range(1, group_count + 1)]
+    for i in range(question_count):
+        multiple_choice = [MultipleChoice(index=index, text=text) for index, text in
+                           enumerate(("Ja", "Nein", "Vielleicht"))] if i % 3 == 0 else []
+        dataset.append(Question(signature=f"{i:032x}", group_id=i % group_count + 1, question_id=i // group_count + 1,
+                                question=f"Frage {i}?", answer_index=1 if multiple_choice else -1,
+                                answer_text="Weiterspielen", created=date(2020, 6, 1), last_edited=date(2021, 6, 2),
+                                multiple_choice=multiple_choice))
+    return dataset
+
+
+@pytest.fixture
+def create_database(tmp_path, monkeypatch) -> Iterator[Callable[[int], DatabaseConnector]]:
+    # creates empty databases (or filled with synthetic_dataset), alembic.ini is found relative to the working directory
+    monkeypatch.chdir(repository_path)
+    connectors = []  # type: List[DatabaseConnector]
+
+    def create(question_count: int = 0) -> DatabaseConnector:
+        connector = DatabaseConnector(str(tmp_path / f"database_{len(connectors)}.db"))
+        connectors.append(connector)
+        if question_count:
+            connector.bulk_fill_database([synthetic_dataset(question_count)])
+        return connector
+
+    yield create
+    for connector in connectors:
+        connector.close_connection()
+        connector.engine.dispose()
+
+
+@contextmanager
+def recorded_statements(engine: Engine) -> Iterator[List[Tuple[str, Any]]]:
+    # (statement, parameters) of every SQL statement executed on engine
+    statements = []
+
+    def record(_conn, _cursor, statement, parameters, _context, _executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+@contextmanager
+def serve(handler: Type[BaseHTTPRequestHandler]) -> Iterator[str]:
+    # local HTTP server in a background thread, yields its base url
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
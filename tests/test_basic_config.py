@@ -0,0 +1,82 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import List, Optional, Tuple
+
+from src.basic_config import check_for_update
+from tests.conftest import serve
+
+etag = '"release-1"'
+
+
+def release(tag_name: str) -> dict:
+    assets = [{'browser_download_url': f"https://example.invalid/{tag_name}/RegeltestCreator{suffix}"}
+              for suffix in (".exe", ".exe.sha256", ".app.zip", "")]
+    return {'tag_name': tag_name, 'body': "Neuerungen", 'html_url': f"https://example.invalid/{tag_name}",
+            'assets': assets}
+
+
+class ReleaseApiHandler(BaseHTTPRequestHandler):
+    """
+    Stub of the GitHub releases API: /releases?per_page=1 (dev) and /releases/latest (stable), answering
+    If-None-Match with 304. The test subclasses it.
+    """
+    delay = 0  # s before answering
+    requests = []  # type: List[Tuple[str, Optional[str]]]  # (path, If-None-Match)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('If-None-Match')))
+        time.sleep(self.delay)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        body = [release("99.1.0.dev1")] if self.path.endswith("per_page=1") else release("99.0.0")
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def release_api(**handler_attributes):
+    handler = type("Handler", (ReleaseApiHandler,), {'requests': [], **handler_attributes})
+    return handler, serve(handler)
+
+
+def test_cached_answer_is_used_within_max_age(tmp_path):
+    cache_path = str(tmp_path / "releases.json")
+    handler, server = release_api()
+    with server as base_url:
+        first = check_for_update(base_url=f"{base_url}/releases", cache_path=cache_path)
+        second = check_for_update(base_url=f"{base_url}/releases", cache_path=cache_path)
+    assert first[0][0] == "99.0.0" and first[1][0] == "99.1.0.dev1"
+    assert second == first
+    assert len(handler.requests) == 2
+
+
+def test_not_modified_keeps_cached_release(tmp_path):
+    cache_path = str(tmp_path / "releases.json")
+    handler, server = release_api()
+    with server as base_url:
+        first = check_for_update(base_url=f"{base_url}/releases", cache_path=cache_path)
+        revalidated = check_for_update(base_url=f"{base_url}/releases", cache_path=cache_path, max_age=0)
+    assert revalidated == first
+    assert [if_none_match for _, if_none_match in handler.requests] == [None, None, etag, etag]
+
+
+def test_timeout_returns_no_update(tmp_path):
+    _, server = release_api(delay=2)
+    with server as base_url:
+        start = time.perf_counter()
+        releases = check_for_update(timeout=0.2, base_url=f"{base_url}/releases",
+                                    cache_path=str(tmp_path / "releases.json"))
+        elapsed = time.perf_counter() - start
+    assert releases == (None, None)
+    assert elapsed < 1.5
@@ -0,0 +1,179 @@
+import io
+import math
+import re
+from datetime import date
+from typing import List, Tuple
+
+import pytest
+
+from src.datatypes import Question, MultipleChoice, Statistics, MergeReport
+from src.main_application import write_sr_regeltest_de
+from src.main_widgets import SelfTestWidget
+from tests.conftest import recorded_statements, synthetic_dataset
+
+question_counts = (10, 1000)
+in_chunk_size = 500  # selectinload (and iter_all_questions) load the options with one SELECT ... IN per 500 questions
+
+
+def export_statements(database) -> int:
+    with recorded_statements(database.engine) as statements:
+        write_sr_regeltest_de(io.StringIO(), database.get_all_question_groups(), database.iter_all_questions())
+    return len(statements)
+
+
+def multiplechoice_statements(database) -> int:
+    with recorded_statements(database.engine) as statements:
+        for question, multiple_choice in database.get_question_multiplechoice():
+            [option.text for option in multiple_choice]
+    return len(statements)
+
+
+@pytest.mark.parametrize('count_statements', [export_statements, multiplechoice_statements])
+def test_statement_count_does_not_grow_per_question(create_database, count_statements):
+    few, many = [count_statements(create_database(question_count)) for question_count in question_counts]
+    assert many <= few + math.ceil(question_counts[1] / in_chunk_size)
+
+
+def query_plans(database, run_queries) -> List[Tuple[str, List[str]]]:
+    # (statement, EXPLAIN QUERY PLAN details) of every statement run_queries executes
+    with recorded_statements(database.engine) as statements:
+        run_queries()
+    with database.engine.connect() as conn:
+        return [(statement, [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)])
+                for statement, parameters in statements]
+
+
+full_scan = re.compile(r"\bSCAN (question|regeltest_question)\b")
+
+
+@pytest.mark.parametrize('run_queries', [
+    lambda database, groups: database.get_questions_by_foreignkey(groups[:2]),
+    lambda database, groups: database.get_questions_by_foreignkey(groups[:2], mchoice=True),
+    lambda database, groups: database.sample_questions(groups[:2], k=10, mchoice=False),
+    lambda database, groups: database.get_question_table_page(groups[0], 'regeltest_count'),
+    lambda database, groups: database.get_question_table_page(groups[0], 'question_id', search="Frage 1"),
+    lambda database, groups: database.get_question_group_config(),
+    lambda database, groups: SelfTestWidget.prepare_level_mode(
+        database.get_questions_by_foreignkey(groups[:2], as_query=True)),
+    lambda database, groups: SelfTestWidget.prepare_prioritize_new(
+        database.get_questions_by_foreignkey(groups[:2], as_query=True)),
+], ids=['by_foreignkey', 'by_foreignkey_mchoice', 'sample', 'table_page', 'table_page_search', 'group_config',
+        'self_test_level', 'self_test_prioritize_new'])
+def test_queries_use_indexes(create_database, run_queries):
+    database = create_database(100)
+    groups = database.get_all_question_groups()
+    plans = query_plans(database, lambda: run_queries(database, groups))
+    assert plans
+    for statement, plan in plans:
+        assert not any(full_scan.search(detail) for detail in plan), f"{statement}\n{plan}"
+
+
+@pytest.mark.parametrize('search', ['Straßenfuß', 'strassenfuss', 'STRASS', 'Grundlinie Maß'])
+def test_search_matches_sharp_s_as_ss(create_database, search):
+    database = create_database(10)
+    database.add_object(Question(signature="f" * 32, group_id=1, question_id=100, question="Wo steht der Straßenfuß?",
+                                 answer_index=1, answer_text="Auf der Grundlinie", created=date(2020, 6, 1),
+                                 last_edited=date(2021, 6, 2),
+                                 multiple_choice=[MultipleChoice(index=0, text="Im Maß"),
+                                                  MultipleChoice(index=1, text="Auf der Grundlinie")]))
+    assert [question.signature for question in database.search_questions(search)] == ["f" * 32]
+
+
+def signature(i: int) -> str:
+    # signature of the i-th question of synthetic_dataset
+    return f"{i:032x}"
+
+
+def stored_question(database, i: int) -> Question:
+    database.session.expire_all()
+    return database.session.get(Question, signature(i))
+
+
+def statement_parameters(statements) -> set:
+    # all parameter values of the recorded statements, executemany parameters are lists of tuples
+    values = set()
+    for _, parameters in statements:
+        for row in parameters if isinstance(parameters, list) else [parameters]:
+            values.update(row.values() if isinstance(row, dict) else row)
+    return values
+
+
+def test_merge_import(create_database):
+    database = create_database(10)
+    for i in (0, 3):
+        database.add_object(Statistics(question_signature=signature(i), correct_solved=i + 1, level=2))
+
+    # question 0 has a new text, question 3 (multiple choice) loses an option and changes one, question 9 is missing
+    # and question 10 is new
+    dataset = [item for item in synthetic_dataset(11)
+               if not isinstance(item, Question) or item.signature != signature(9)]
+    for item in dataset:
+        if isinstance(item, Question) and item.signature == signature(0):
+            item.question = "Geänderte Frage?"
+        elif isinstance(item, Question) and item.signature == signature(3):
+            item.multiple_choice = [MultipleChoice(index=0, text="Ja"), MultipleChoice(index=1, text="Doch")]
+
+    with recorded_statements(database.engine) as statements:
+        report = database.merge_import([dataset])
+
+    assert report == MergeReport(inserted=1, updated=2, unchanged=7, removed=1)
+    assert stored_question(database, 0).question == "Geänderte Frage?"
+    assert [option.text for option in stored_question(database, 3).multiple_choice] == ["Ja", "Doch"]
+    for i in (0, 3):
+        assert stored_question(database, i).statistics.correct_solved == i + 1
+        assert stored_question(database, i).statistics.level == 2
+    assert stored_question(database, 9).removed == date.today()
+    assert stored_question(database, 10).removed is None
+    # no statement wrote the unchanged questions
+    written = statement_parameters(statements)
+    assert not written & {signature(i) for i in (1, 2, 4, 5, 6, 7, 8)}
+    assert {signature(i) for i in (0, 3, 9, 10)} <= written
+
+
+def test_merge_import_by_key(create_database):
+    # sr-regeltest.de questions have no signature and are matched by (group_id, question_id), unchanged lists the
+    # questions an incremental download left out
+    database = create_database(10)
+    dataset = [item for item in synthetic_dataset(10) if not isinstance(item, Question) or item.signature in
+               (signature(1), signature(2))]
+    for item in dataset:
+        if isinstance(item, Question):
+            item.signature = None
+            if item.question_id == 1 and item.group_id == 2:
+                item.answer_text = "Strafstoß"
+    unchanged = [(stored_question(database, i).group_id, stored_question(database, i).question_id)
+                 for i in range(3, 9)]
+
+    report = database.merge_import([dataset], unchanged)
+
+    assert report == MergeReport(inserted=0, updated=1, unchanged=7, removed=2)
+    assert stored_question(database, 1).answer_text == "Strafstoß"
+    assert [i for i in range(10) if stored_question(database, i).removed] == [0, 9]
+
+
+def test_snapshot_leaves_out_removed_questions(create_database, tmp_path):
+    database = create_database(10)
+    database.merge_import([[item for item in synthetic_dataset(10)
+                            if not isinstance(item, Question) or item.signature != signature(3)]])
+    path = str(tmp_path / "snapshot.db")
+    database.export_snapshot(path)
+
+    report = create_database().load_snapshot(path)
+
+    assert report.inserted == 9
+
+
+def test_search_survives_renumbered_rowids(create_database):
+    database = create_database(10)
+    # VACUUM may renumber the rowids of question (it has no INTEGER PRIMARY KEY), updating them does the same
+    # without firing the search index triggers
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE question SET rowid = 1000 - rowid")
+    assert [question.signature for question in database.search_questions("Frage 7")] == [signature(7)]
+    assert database.get_filtered_signatures([], "Frage 7") == {stored_question(database, 7).group_id: {signature(7)}}
+
+    question = stored_question(database, 7)
+    question.question = "Abstoß?"
+    database.add_object(question)
+    assert [question.signature for question in database.search_questions("abstoss")] == [signature(7)]
+    assert not database.search_questions("Frage 7")
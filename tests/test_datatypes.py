@@ -0,0 +1,44 @@
+import time
+from typing import Dict, Iterator
+
+from src.datatypes import ImportReport, iter_questions_and_mchoice
+
+
+def synthetic_rules(count: int, duplicate_every: int = 100) -> Iterator[Dict[str, str]]:
+    # rules as read from the DFB XML, every duplicate_every-th rule repeats the number or signature of an earlier one
+    for i in range(count):
+        number = i - 1 if i % duplicate_every == 1 else i
+        signature = i - 2 if i % duplicate_every == 2 else i
+        yield {
+            "LNR": f"{number % 17 + 1:02d}{number // 17 + 1:05d}",
+            "SIGNATUR": f"{signature:032x}",
+            "FRAGE": f"Frage {i}?",
+            "MCHOICE": "a () Ja\nb () Nein\nc () Vielleicht" if i % 3 == 0 else " ",
+            "ANTWORT": "b) Nein" if i % 3 == 0 else "Weiterspielen",
+            "ERST": "01.06.2020",
+            "AEND": " ",
+        }
+
+
+def convert(count: int) -> float:
+    rules = list(synthetic_rules(count))
+    start = time.perf_counter()
+    for _ in iter_questions_and_mchoice(rules):
+        pass
+    return time.perf_counter() - start
+
+
+def test_duplicates_are_reported():
+    report = ImportReport()
+    questions = list(iter_questions_and_mchoice(synthetic_rules(1000), report))
+    assert len(questions) == report.imported == 980
+    assert report.duplicate_ids == [(i % 17 + 1, i // 17 + 1) for i in range(0, 1000, 100)]
+    assert report.duplicate_signatures == [f"{i:032x}" for i in range(0, 1000, 100)]
+
+
+def test_duplicate_detection_scales_linearly():
+    # doubling the rules doubles the time for hash based lookups, a list based one would quadruple it
+    convert(1000)
+    small = convert(25000)
+    large = convert(50000)
+    assert large / small < 3
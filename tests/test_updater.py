@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import List, Optional
+
+import pytest
+
+from src.updater import DownloadThread
+from tests.conftest import serve
+
+content = os.urandom(3 * 1024 * 1024 + 123)
+checksum = hashlib.sha256(content).hexdigest()
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    """
+    Serves content at /RegeltestCreator.exe and its sha256sum at /RegeltestCreator.exe.sha256. The class attributes
+    configure how, the test subclasses it.
+    """
+    honor_range = True
+    # the connection is dropped (or stalls) after this many bytes of the body
+    drop_after = None  # type: Optional[int]
+    stall = False
+    checksum_text = f"{checksum}  RegeltestCreator.exe\n"
+    ranges = []  # type: List[Optional[str]]
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.endswith(".sha256"):
+            self._send(200, self.checksum_text.encode())
+            return
+        self.ranges.append(self.headers.get('Range'))
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get('Range') or "")
+        start = int(match.group(1)) if match and self.honor_range else 0
+        if start >= len(content):
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{len(content)}")
+            self.send_header('Content-Length', "0")
+            self.end_headers()
+            return
+        body = content[start:]
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header('Content-Range', f"bytes {start}-{len(content) - 1}/{len(content)}")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.drop_after is None:
+            self.wfile.write(body)
+            return
+        self.wfile.write(body[:self.drop_after])
+        self.wfile.flush()
+        if self.stall:
+            time.sleep(3)
+        self.close_connection = True
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def download(tmp_path, with_checksum: bool = True, **handler_attributes):
+    """
+    Runs a DownloadThread synchronously against a ReleaseHandler configured by handler_attributes. Returns the
+    download path, the list of failure messages and the Range headers the server received.
+    """
+    handler = type("Handler", (ReleaseHandler,), {'ranges': [], **handler_attributes})
+    path = str(tmp_path / "RegeltestCreator.exe")
+    failures = []
+    with serve(handler) as base_url:
+        thread = DownloadThread(f"{base_url}/RegeltestCreator.exe", path,
+                                f"{base_url}/RegeltestCreator.exe.sha256" if with_checksum else None)
+        thread.timeout = (1, 0.5)
+        thread.download_failed.connect(failures.append)
+        thread.run()
+    return path, failures, handler.ranges
+
+
+def read(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def write_part(tmp_path, data: bytes) -> str:
+    part_path = str(tmp_path / "RegeltestCreator.exe.part")
+    with open(part_path, 'wb') as file:
+        file.write(data)
+    return part_path
+
+
+def test_resumes_partial_download(tmp_path):
+    write_part(tmp_path, content[:1000])
+    path, failures, ranges = download(tmp_path)
+    assert not failures
+    assert ranges == ["bytes=1000-"]
+    assert read(path) == content
+
+
+def test_restarts_if_range_is_ignored(tmp_path):
+    write_part(tmp_path, b"x" * 1000)
+    path, failures, ranges = download(tmp_path, honor_range=False)
+    assert not failures
+    assert read(path) == content
+
+
+def test_complete_partial_download(tmp_path):
+    write_part(tmp_path, content)
+    path, failures, _ = download(tmp_path)
+    assert not failures
+    assert read(path) == content
+
+
+@pytest.mark.parametrize('with_checksum', [True, False])
+@pytest.mark.parametrize('stall', [False, True], ids=['dropped', 'stalled'])
+def test_interrupted_download_is_kept_and_resumed(tmp_path, stall, with_checksum):
+    path, failures, _ = download(tmp_path, with_checksum, drop_after=100000, stall=stall)
+    assert len(failures) == 1
+    assert not os.path.exists(path)
+    part_path = str(tmp_path / "RegeltestCreator.exe.part")
+    # the bytes of the failed read are lost
+    part = read(part_path)
+    assert part and content.startswith(part)
+
+    path, failures, ranges = download(tmp_path, with_checksum)
+    assert not failures
+    assert ranges == [f"bytes={len(part)}-"]
+    assert read(path) == content
+    assert not os.path.exists(part_path)
+
+
+@pytest.mark.parametrize('checksum_text', [f"{'0' * 64}  RegeltestCreator.exe\n", " \n"], ids=['wrong', 'empty'])
+def test_checksum_mismatch_fails(tmp_path, checksum_text):
+    path, failures, _ = download(tmp_path, checksum_text=checksum_text)
+    assert len(failures) == 1
+    assert not os.path.exists(path)